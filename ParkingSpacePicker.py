@@ -1,16 +1,49 @@
 import cv2
-import pickle
 import numpy as np
 
+from slot_geometry import PerspectiveRemap, rect_polygons, transform_polygons
+from layout_format import make_layout, polygon_bytes, positions
+from position_store import PositionJournal, atomic_write, load_layout
+from slot_layout import SlotGrid, layout_block
+
+# Slot numbers are only drawn up to this many slots (unreadable beyond, and slow)
+LABEL_LIMIT = 1000
+
+SLOT_COLOR = (255, 0, 255)
+PREVIEW_COLOR = (0, 255, 255)
+
 class ParkingSpacePicker:
     def __init__(self):
         self.width, self.height = 103, 43
         self.posList = []
+        self.slot_attrs = []  # Per slot (w, h, zone, camera) from the layout file, kept for saving
+        self.zone = 0  # Zone id given to new slots (0 = the camera's default zone)
         self.load_parking_positions()
+
+        # Edits go to an append-only journal in coalesced batches; the full
+        # snapshot is only rewritten on save, quit or when the journal grows
+        self.store = PositionJournal('CarParkPos')
+
+        # Spatial index for hit tests, overlap checks and area selection
+        self.grid = SlotGrid(self.width, self.height)
+        self.grid.rebuild(self.posList)
+
+        # Slots are drawn once onto a cached layer and copied onto each frame
+        self.layer = None
+        self.layer_mask = None
+        self.layer_dirty = True
+
+        # Drag gestures: Ctrl+left drag lays out rows, Shift+right drag selects an area
+        self.drag_mode = None
+        self.drag_start = None
+        self.drag_end = None
+        self.frame_size = None  # (width, height) of the displayed image
         
         # Perspective transform variables
         self.perspective_matrix = None
         self.perspective_mode = False
+        self.perspective_corners = None  # Trackbar values the matrix was built from
+        self.remap = None  # Precomputed remap tables for perspective_matrix
         
         # Create control window
         self.create_control_window()
@@ -18,17 +51,19 @@ class ParkingSpacePicker:
     def load_parking_positions(self):
         """Load existing parking positions"""
         try:
-            with open('CarParkPos', 'rb') as f:
-                self.posList = pickle.load(f)
+            layout = load_layout('CarParkPos')
+            self.posList = positions(layout)
+            self.slot_attrs = layout[['w', 'h', 'zone', 'camera']].tolist()
             print(f"Loaded {len(self.posList)} existing parking positions")
         except:
             print("No existing parking positions found. Creating new ones.")
             self.posList = []
+            self.slot_attrs = []
     
     def create_control_window(self):
         """Create control window with trackbars"""
         cv2.namedWindow("Controls")
-        cv2.resizeWindow("Controls", 400, 200)
+        cv2.resizeWindow("Controls", 400, 260)
         
         # Perspective transform controls
         cv2.createTrackbar("Perspective Mode", "Controls", 0, 1, self.empty)
@@ -40,12 +75,16 @@ class ParkingSpacePicker:
         cv2.createTrackbar("Bottom-Right Y", "Controls", 90, 100, self.empty)
         cv2.createTrackbar("Bottom-Left X", "Controls", 10, 100, self.empty)
         cv2.createTrackbar("Bottom-Left Y", "Controls", 90, 100, self.empty)
+
+        # Bulk layout controls
+        cv2.createTrackbar("Spacing", "Controls", 4, 50, self.empty)
+        cv2.createTrackbar("Rows", "Controls", 1, 20, self.empty)
         
     def empty(self, a):
         pass
     
     def get_perspective_transform(self, img):
-        """Get perspective transform matrix based on trackbar values"""
+        """Get perspective transform matrix based on trackbar values (rebuilt only when they change)"""
         h, w = img.shape[:2]
         
         # Get trackbar values (as percentages)
@@ -57,6 +96,10 @@ class ParkingSpacePicker:
         br_y = cv2.getTrackbarPos("Bottom-Right Y", "Controls") / 100.0
         bl_x = cv2.getTrackbarPos("Bottom-Left X", "Controls") / 100.0
         bl_y = cv2.getTrackbarPos("Bottom-Left Y", "Controls") / 100.0
+
+        corners = (w, h, tl_x, tl_y, tr_x, tr_y, br_x, br_y, bl_x, bl_y)
+        if corners == self.perspective_corners:
+            return self.perspective_matrix
         
         # Define source points (original image corners)
         src_points = np.float32([
@@ -75,47 +118,170 @@ class ParkingSpacePicker:
         ])
         
         self.perspective_matrix = cv2.getPerspectiveTransform(src_points, dst_points)
+        self.perspective_corners = corners
         return self.perspective_matrix
     
     def apply_perspective_transform(self, img):
         """Apply perspective transform to correct camera angle"""
-        if self.perspective_matrix is None:
-            self.get_perspective_transform(img)
+        matrix = self.get_perspective_transform(img)
         
         h, w = img.shape[:2]
-        transformed = cv2.warpPerspective(img, self.perspective_matrix, (w, h))
-        return transformed
+        # The remap tables are only rebuilt when the matrix or image size changes
+        if self.remap is None or not self.remap.matches(matrix, (w, h)):
+            self.remap = PerspectiveRemap(matrix, (w, h))
+        return self.remap.apply(img)
+
+    def slot_polygons(self):
+        """Slot outlines in camera-frame coordinates for the detector.
+
+        Slots placed on the perspective-corrected view are mapped back by
+        transforming only their four corners with the inverse matrix.
+        """
+        polygons = rect_polygons(self.posList, self.width, self.height)
+        if self.perspective_mode and self.perspective_matrix is not None:
+            polygons = transform_polygons(polygons, np.linalg.inv(self.perspective_matrix))
+        return [p.tolist() for p in polygons]
     
     def mouseClick(self, events, x, y, flags, params):
         """Handle mouse clicks for adding/removing parking spaces"""
-        if events == cv2.EVENT_LBUTTONDOWN:
+        if self.drag_mode is not None:
+            # Finish or extend a drag gesture
+            self.drag_end = (x, y)
+            if events == cv2.EVENT_LBUTTONUP and self.drag_mode == "layout":
+                self.add_slots(self.layout_preview())
+                self.drag_mode = None
+            elif events == cv2.EVENT_RBUTTONUP and self.drag_mode == "select":
+                self.remove_slots(self.grid.query_inside(*self.drag_start, *self.drag_end))
+                self.drag_mode = None
+        elif events == cv2.EVENT_LBUTTONDOWN and flags & cv2.EVENT_FLAG_CTRLKEY:
+            self.drag_mode, self.drag_start, self.drag_end = "layout", (x, y), (x, y)
+        elif events == cv2.EVENT_RBUTTONDOWN and flags & cv2.EVENT_FLAG_SHIFTKEY:
+            self.drag_mode, self.drag_start, self.drag_end = "select", (x, y), (x, y)
+        elif events == cv2.EVENT_LBUTTONDOWN:
             # Add new parking space
-            self.posList.append((x, y))
+            overlaps = self.grid.overlapping(x, y)
+            self.add_slots([(x, y)], skip_overlaps=False)
             print(f"Added parking space at ({x}, {y})")
+            if len(overlaps):
+                print(f"Warning: overlaps {len(overlaps)} existing space(s)")
         elif events == cv2.EVENT_RBUTTONDOWN:
             # Remove parking space
-            for i, pos in enumerate(self.posList):
-                x1, y1 = pos
-                if x1 < x < x1 + self.width and y1 < y < y1 + self.height:
-                    removed = self.posList.pop(i)
-                    print(f"Removed parking space at {removed}")
-                    break
-        
-        # Save positions after any change
-        self.save_parking_positions()
+            i = self.grid.hit(x, y)
+            if i is not None:
+                removed = self.posList[i]
+                self.remove_slots([i])
+                print(f"Removed parking space at {removed}")
+        # Mouse moves and clicks that change nothing are not persisted
+
+    def layout_preview(self):
+        """Slots the current layout drag would add (before overlap filtering)"""
+        spacing = cv2.getTrackbarPos("Spacing", "Controls")
+        rows = max(1, cv2.getTrackbarPos("Rows", "Controls"))
+        return layout_block(self.drag_start, self.drag_end, self.width, self.height, spacing, rows)
+
+    def add_slots(self, positions, skip_overlaps=True):
+        """Append slots, skipping ones that overlap the existing layout or leave the image.
+
+        Generated rows never overlap themselves, so the index is rebuilt once
+        after the whole batch.
+        """
+        added = []
+        for x, y in positions:
+            if skip_overlaps:
+                if self.frame_size is not None:
+                    frame_w, frame_h = self.frame_size
+                    if x < 0 or y < 0 or x + self.width > frame_w or y + self.height > frame_h:
+                        continue
+                if len(self.grid.overlapping(x, y)):
+                    continue
+            self.posList.append((x, y))
+            self.slot_attrs.append((self.width, self.height, self.zone, 0))
+            self.store.record({"op": "add", "pos": [x, y], "size": [self.width, self.height], "zone": self.zone})
+            added.append(len(self.posList) - 1)
+        self.grid.rebuild(self.posList)
+
+        if len(added) > 1:
+            print(f"Added {len(added)} parking spaces ({len(positions) - len(added)} skipped)")
+        if self.layer is None or self.layer_dirty or len(self.posList) > LABEL_LIMIT >= len(self.posList) - len(added):
+            self.layer_dirty = True  # Labels switch off; redraw everything once
+        else:
+            for i in added:
+                self.draw_slot(i)
+
+    def remove_slots(self, indices):
+        """Remove slots by index; the journal replays removals highest index first"""
+        indices = sorted((int(i) for i in indices), reverse=True)
+        if not indices:
+            return
+        boxes = [self.posList[i] for i in indices]
+        for i in indices:
+            self.posList.pop(i)
+            self.slot_attrs.pop(i)
+            self.store.record({"op": "remove", "index": i})
+        self.grid.rebuild(self.posList)
+        if len(indices) > 1:
+            print(f"Removed {len(indices)} parking spaces")
+
+        # Numbers after a removed slot shift, so labelled layouts redraw fully
+        if self.layer is None or len(self.posList) <= LABEL_LIMIT or len(indices) > 50:
+            self.layer_dirty = True
+        else:
+            for x, y in boxes:
+                self.repaint_area(x - 2, y - 2, x + self.width + 3, y + self.height + 3)
+
+    def persist_changes(self):
+        """Journal edits once a burst of clicks has settled; compact when the journal is long"""
+        if self.store.flush() and self.store.needs_compaction():
+            self.save_parking_positions()
     
     def save_parking_positions(self):
-        """Save parking positions to file"""
-        with open('CarParkPos', 'wb') as f:
-            pickle.dump(self.posList, f)
+        """Save parking positions to file (atomic snapshot, journal reset)"""
+        attrs = np.array(self.slot_attrs, dtype=np.int64).reshape(-1, 4)
+        self.store.compact(make_layout(self.posList, attrs[:, 0], attrs[:, 1], attrs[:, 2], attrs[:, 3]))
+        atomic_write('CarParkPolygons', polygon_bytes(self.slot_polygons()))
         print(f"Saved {len(self.posList)} parking positions")
     
+    def draw_slot(self, i, clip=None):
+        """Draw slot i onto the cached layer, optionally only inside clip=(x0, y0, x1, y1)"""
+        x, y = self.posList[i]
+        layer, mask = self.layer, self.layer_mask
+        if clip is not None:
+            x0, y0, x1, y1 = clip
+            layer, mask = layer[y0:y1, x0:x1], mask[y0:y1, x0:x1]
+            x, y = x - x0, y - y0
+        for target, color in ((layer, SLOT_COLOR), (mask, 255)):
+            cv2.rectangle(target, (x, y), (x + self.width, y + self.height), color, 2)
+            if len(self.posList) <= LABEL_LIMIT:
+                cv2.putText(target, str(i+1), (x + 5, y + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+    def repaint_area(self, x0, y0, x1, y1):
+        """Clear part of the layer and redraw the slots touching it"""
+        h, w = self.layer.shape[:2]
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, w), min(y1, h)
+        if x1 <= x0 or y1 <= y0:
+            return
+        self.layer[y0:y1, x0:x1] = 0
+        self.layer_mask[y0:y1, x0:x1] = 0
+        for i in self.grid.query_rect(x0 - 2, y0 - 2, x1 + 2, y1 + 2):
+            self.draw_slot(i, (x0, y0, x1, y1))
+
     def draw_parking_spaces(self, img):
-        """Draw all parking spaces on the image"""
-        for i, pos in enumerate(self.posList):
-            x, y = pos
-            cv2.rectangle(img, pos, (x + self.width, y + self.height), (255, 0, 255), 2)
-            cv2.putText(img, str(i+1), (x + 5, y + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 1)
+        """Draw all parking spaces on the image (from the cached layer)"""
+        if self.layer is None or self.layer.shape != img.shape or self.layer_dirty:
+            self.layer = np.zeros_like(img)
+            self.layer_mask = np.zeros(img.shape[:2], dtype=np.uint8)
+            for i in range(len(self.posList)):
+                self.draw_slot(i)
+            self.layer_dirty = False
+        cv2.copyTo(self.layer, self.layer_mask, img)
+
+    def draw_drag_preview(self, img):
+        """Outline the slots a layout drag would add, or the area a selection covers"""
+        if self.drag_mode == "layout":
+            for x, y in self.layout_preview()[:5000]:
+                cv2.rectangle(img, (x, y), (x + self.width, y + self.height), PREVIEW_COLOR, 1)
+        elif self.drag_mode == "select":
+            cv2.rectangle(img, self.drag_start, self.drag_end, PREVIEW_COLOR, 1)
     
     def draw_perspective_guide(self, img):
         """Draw perspective transform guide lines"""
@@ -148,17 +314,27 @@ class ParkingSpacePicker:
         print("Instructions:")
         print("- Left click to add parking space")
         print("- Right click on existing space to remove it")
+        print("- Ctrl + left drag to lay out a row (Rows/Spacing trackbars for blocks)")
+        print("- Shift + right drag to remove every space inside an area")
         print("- Adjust perspective transform controls for different camera angles")
         print("- Press 'q' to quit")
         print("- Press 'c' to clear all spaces")
         print("- Press 's' to save current configuration")
+        print("- Press '0'-'9' to pick the zone new spaces belong to (0 = camera default)")
         
+        # Load image once; every displayed frame starts from a copy
+        base_img = cv2.imread('carParkImg.png')
+        if base_img is None:
+            print("Error: Could not load carParkImg.png")
+            cv2.destroyAllWindows()
+            return
+
+        cv2.namedWindow("Parking Space Picker")
+        cv2.setMouseCallback("Parking Space Picker", self.mouseClick)
+
         while True:
-            # Load image
-            img = cv2.imread('carParkImg.png')
-            if img is None:
-                print("Error: Could not load carParkImg.png")
-                break
+            img = base_img.copy()
+            self.frame_size = (img.shape[1], img.shape[0])
             
             # Check if perspective mode is enabled
             self.perspective_mode = cv2.getTrackbarPos("Perspective Mode", "Controls") == 1
@@ -169,13 +345,13 @@ class ParkingSpacePicker:
             
             # Draw parking spaces
             self.draw_parking_spaces(img)
+            self.draw_drag_preview(img)
             
             # Draw perspective guide
             self.draw_perspective_guide(img)
             
             # Display image
             cv2.imshow("Parking Space Picker", img)
-            cv2.setMouseCallback("Parking Space Picker", self.mouseClick)
             
             # Handle key presses
             key = cv2.waitKey(1) & 0xFF
@@ -183,13 +359,23 @@ class ParkingSpacePicker:
                 break
             elif key == ord('c'):
                 self.posList.clear()
-                self.save_parking_positions()
+                self.slot_attrs.clear()
+                self.store.record({"op": "clear"})
+                self.grid.rebuild(self.posList)
+                self.layer_dirty = True
                 print("Cleared all parking spaces")
             elif key == ord('s'):
                 self.save_parking_positions()
                 print("Configuration saved!")
+            elif ord('0') <= key <= ord('9'):
+                self.zone = key - ord('0')
+                print(f"New parking spaces go to zone {self.zone}")
+
+            self.persist_changes()
         
         # Cleanup
+        if self.store.dirty or self.store.journal_entries:
+            self.save_parking_positions()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
@@ -1,13 +1,12 @@
 import streamlit as st
 import re
-import pandas as pd
+import time
 
-import firebase_admin
-from firebase_admin import credentials, db
-import cv2
-import numpy as np
-import pickle
-import os
+from app_cache import (ZONE_REFRESH_SECONDS, fragment, get_db, get_report_queue, get_reports_cache,
+                       get_user_directory, get_write_queue, get_zone_supervisor, get_zones, invalidate_user,
+                       live_zone_counts, report_rows, user_record)
+from report_queue import apply_report
+from reports_cache import TABLE_COLUMNS
 
 # -----------------------------
 # Inlined Pages (Single-file App)
@@ -24,16 +23,10 @@ def login_page():
     if choice == "Sign Up":
         if st.button("Create Account"):
             if email and password:
-                user_ref = db.reference("/users")
-                existing = user_ref.order_by_child("email").equal_to(email).get()
-
-                if existing:
+                if not get_user_directory().create(email, password):
                     st.error("⚠️ Email already registered")
                 else:
-                    user_ref.push({
-                        "email": email,
-                        "password": password  # ⚠️ Plain text, production me hashing karo!
-                    })
+                    invalidate_user(email)  # Forget a cached "no such user"
                     st.success("✅ Account created successfully!")
             else:
                 st.warning("Please fill all fields")
@@ -41,29 +34,42 @@ def login_page():
     elif choice == "Login":
         if st.button("Login"):
             if email and password:
-                user_ref = db.reference("/users")
-                users = user_ref.order_by_child("email").equal_to(email).get()
-
-                if users:
-                    for _, user in users.items():
-                        if user["password"] == password:
-                            st.session_state["logged_in"] = True
-                            st.session_state["user_email"] = email
-                            st.success("✅ Login successful!")
-                            st.rerun()
-                        else:
-                            st.error("❌ Wrong password")
+                # One indexed query returns the login check and the role together
+                user, error = get_user_directory().authenticate(email, password)
+                if user:
+                    st.session_state["logged_in"] = True
+                    st.session_state["user_email"] = user["email"]
+                    st.session_state["role"] = user["role"]
+                    st.success("✅ Login successful!")
+                    st.rerun()
                 else:
-                    st.error("❌ No account found with this email")
+                    st.error(error)
 
 
 def view_page(zones):
     st.subheader("Parking Zones")
+    # The grid refreshes on its own timer; the rest of the page does not rerun
+    fragment(run_every=ZONE_REFRESH_SECONDS)(zone_grid)(zones)
+
+
+def zone_status(zone, live):
+    """Live "available/total" from the zone's camera feeds, else the status set on the Status page"""
+    counts = live.get(zone)
+    if not counts or not counts["total"]:
+        return st.session_state.statuses[zone]
+    icon = "✅" if counts["available"] else "❌"
+    status = f"{icon} {counts['available']}/{counts['total']} available"
+    if counts["live_feeds"] < counts["feeds"]:
+        status += f" ({counts['live_feeds']}/{counts['feeds']} feeds)"
+    return status
 
+
+def zone_grid(zones):
+    live = live_zone_counts()
     cols = st.columns(len(zones))
     for i, col in enumerate(cols):
         with col:
-            status = st.session_state.statuses[zones[i]]
+            status = zone_status(zones[i], live)
             color = "#d4edda" if "✅" in status else "#f8d7da"
             text_color = "#155724" if "✅" in status else "#721c24"
 
@@ -93,70 +99,78 @@ def status_page(zones):
     cols = st.columns(len(zones))
     for i, col in enumerate(cols):
         with col:
-            zone = zones[i]
-            status = st.session_state.statuses[zone]
-            color = "#d4edda" if "✅" in status else "#f8d7da"
-            text_color = "#155724" if "✅" in status else "#721c24"
-
-            with st.container():
-                st.markdown(
-                    f"""
-                    <div style="
-                        border: 2px solid #4CAF50;
-                        border-radius: 16px;
-                        padding: 20px;
-                        text-align: center;
-                        font-size: 20px;
-                        font-weight: bold;
-                        background-color: {color};
-                        color: {text_color};
-                        box-shadow: 4px 4px 12px rgba(0,0,0,0.2);
-                        margin-bottom: 10px;
-                    ">
-                        {zone} <br> {status}
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-
-                btn_col1, btn_col2, btn_col3 = st.columns([1, 1, 1])
-
-                with btn_col1:
-                    if st.button("✅", key=f"avail_{zone}"):
-                        st.session_state.statuses[zone] = "✅ Available"
-                        st.rerun()
-
-                with btn_col2:
-                    if st.button("❌", key=f"occ_{zone}"):
-                        st.session_state.statuses[zone] = "❌ Occupied"
-                        st.rerun()
-
-                with btn_col3:
-                    if st.button("📞", key=f"toggle_{zone}"):
-                        st.session_state.active_contact = (
-                            None if st.session_state.active_contact == zone else zone
-                        )
-                        st.rerun()
-
-            if st.session_state.active_contact == zone:
-                new_number = st.text_input(
-                    f"Edit contact for {zone}",
-                    value=st.session_state.contacts[zone],
-                    key=f"contact_input_{zone}",
-                    label_visibility="collapsed"
-                )
-                st.session_state.contacts[zone] = new_number
-
-                if st.button("📞 Call", key=f"call_{zone}"):
-                    st.markdown(
-                        f'<meta http-equiv="refresh" content="0; url=tel:{new_number}">',
-                        unsafe_allow_html=True
-                    )
+            zone_control(zones[i])
+
+
+def _set_status(zone, status):
+    st.session_state.statuses[zone] = status
+
+
+@fragment
+def zone_control(zone):
+    """One zone's tile, buttons and contact editor; a click reruns only this tile"""
+    status = st.session_state.statuses[zone]
+    color = "#d4edda" if "✅" in status else "#f8d7da"
+    text_color = "#155724" if "✅" in status else "#721c24"
+
+    with st.container():
+        st.markdown(
+            f"""
+            <div style="
+                border: 2px solid #4CAF50;
+                border-radius: 16px;
+                padding: 20px;
+                text-align: center;
+                font-size: 20px;
+                font-weight: bold;
+                background-color: {color};
+                color: {text_color};
+                box-shadow: 4px 4px 12px rgba(0,0,0,0.2);
+                margin-bottom: 10px;
+            ">
+                {zone} <br> {status}
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+        btn_col1, btn_col2, btn_col3 = st.columns([1, 1, 1])
+
+        # Callbacks run before the fragment reruns, so the tile above shows the new status
+        with btn_col1:
+            st.button("✅", key=f"avail_{zone}", on_click=_set_status, args=(zone, "✅ Available"))
+
+        with btn_col2:
+            st.button("❌", key=f"occ_{zone}", on_click=_set_status, args=(zone, "❌ Occupied"))
+
+        with btn_col3:
+            if st.button("📞", key=f"toggle_{zone}"):
+                previous = st.session_state.active_contact
+                st.session_state.active_contact = None if previous == zone else zone
+                if previous not in (None, zone):
+                    st.rerun()  # Another tile's contact editor has to close too
+
+    if st.session_state.active_contact == zone:
+        new_number = st.text_input(
+            f"Edit contact for {zone}",
+            value=st.session_state.contacts[zone],
+            key=f"contact_input_{zone}",
+            label_visibility="collapsed"
+        )
+        st.session_state.contacts[zone] = new_number
+
+        if st.button("📞 Call", key=f"call_{zone}"):
+            st.markdown(
+                f'<meta http-equiv="refresh" content="0; url=tel:{new_number}">',
+                unsafe_allow_html=True
+            )
 
 
 def report_page():
     st.subheader("📝 Reports")
-    reports_ref = db.reference("/reports")
+    reports_ref = get_db().child("reports")
+    reports = get_reports_cache()
+    submissions = get_report_queue()
 
     # 🚀 Report form
     with st.form("report_form"):
@@ -177,48 +191,42 @@ def report_page():
             elif not (re.match(old_format_pattern, vehicle_number) or re.match(bharat_format_pattern, vehicle_number)):
                 st.error("❌ Invalid format. Use GJ01AB1234 or 22BH1234AA.")
             else:
-                vehicle_ref = reports_ref.child(vehicle_number)
-                current_data = vehicle_ref.get()
-
-                if current_data:
-                    new_count = current_data.get("violations", 0) + 1
-                    fine = current_data.get("fine", 0)
-
-                    if new_count % 3 == 0:  # har 3rd violation pe ₹500 fine
-                        fine += 500
-
-                    vehicle_ref.update({
-                        "vehicle_number": vehicle_number,
-                        "type": vehicle_type,
-                        "violations": new_count,
-                        "fine": fine,
-                        "status": current_data.get("status", "unpaid")
-                    })
-                else:
-                    vehicle_ref.set({
-                        "vehicle_number": vehicle_number,
-                        "type": vehicle_type,
-                        "violations": 1,
-                        "fine": 0,
-                        "status": "unpaid"
-                    })
+                # Queued durably and applied by one transaction in the background
+                submission = submissions.submit(vehicle_number, vehicle_type)
+                # Show the expected record now; the live cache follows the real one when it lands
+                reports.put(vehicle_number, apply_report(reports.get(vehicle_number), submission))
 
                 st.success(f"✅ Reported: {vehicle_number} ({vehicle_type})")
 
-    # 📋 Show table
-    data = reports_ref.get()
-    if data:
-        table_data = []
-        for v, d in data.items():
-            table_data.append({
-                "Vehicle": v,
-                "Type": d.get("type", "N/A"),           # safe get
-                "Violations": d.get("violations", 0),
-                "Fine": d.get("fine", 0),
-                "Status": d.get("status", "unpaid")
-            })
-        df = pd.DataFrame(table_data)
-        st.table(df)
+    if len(submissions):
+        st.caption(f"⏳ {len(submissions)} report(s) waiting to be saved")
+    if submissions.error:
+        st.caption(f"⚠ {submissions.error}")
+
+    # 📋 Show table (from the live cache, one page at a time)
+    if reports.error:
+        st.caption(f"⚠ {reports.error}")
+    df = reports.frame()
+    if not df.empty:
+        search_col, status_col, sort_col, order_col = st.columns(4)
+        search = search_col.text_input("Search vehicle", key="report_search")
+        status = status_col.selectbox("Status", ["All", "unpaid", "paid"], key="report_status")
+        sort_by = sort_col.selectbox("Sort by", TABLE_COLUMNS, key="report_sort")
+        descending = order_col.checkbox("Descending", key="report_descending")
+
+        # Shared across sessions until the next change to /reports
+        matches = report_rows(reports.version, search, None if status == "All" else status, sort_by, descending)
+
+        size_col, page_col = st.columns(2)
+        page_size = size_col.selectbox("Rows per page", [25, 50, 100], key="report_page_size")
+        pages = max(1, -(-len(matches) // page_size))
+        # Clamped rather than max_value, so a shrinking filter never leaves an invalid widget value
+        page = min(page_col.number_input("Page", min_value=1, value=1, key="report_page"), pages) - 1
+        start = page * page_size
+        shown = matches.iloc[start:start + page_size]
+        st.dataframe(shown, hide_index=True, width="stretch")
+        st.caption(f"Page {page + 1} of {pages}: {len(shown)} of {len(matches)} matching reports "
+                   f"({len(df)} total)")
 
     # 🚨 Clear fine
     vehicle_to_clear = st.text_input("Enter vehicle number to clear fine:")
@@ -229,8 +237,11 @@ def report_page():
         else:
             # Validate against allowed Firebase key pattern
             if re.match(r'^[A-Z0-9]+$', vehicle_to_clear):
-                if reports_ref.child(vehicle_to_clear).get():
-                    reports_ref.child(vehicle_to_clear).delete()
+                if (vehicle_to_clear in reports if reports.seeded.is_set()
+                        else reports_ref.child(vehicle_to_clear).get()):
+                    # Same queue as the reports, so one still queued cannot land after the clear
+                    submissions.clear(vehicle_to_clear)
+                    reports.put(vehicle_to_clear, None)
                     st.success(f"✅ Cleared & removed {vehicle_to_clear} from Firebase.")
                 else:
                     st.warning(f"⚠ Vehicle {vehicle_to_clear} not found in reports.")
@@ -239,76 +250,25 @@ def report_page():
 
 
 # -----------------------------
-# Headless detector integration for Zone 1 sync
+# Camera feeds behind the zone counts (zones.json)
 # -----------------------------
-def _load_positions(positions_candidates=("CarParkPos", "CarParkPos.unknown")):
-    for path in positions_candidates:
-        try:
-            if os.path.exists(path):
-                with open(path, 'rb') as f:
-                    return pickle.load(f)
-        except Exception:
-            continue
-    return []
-
-
-def compute_available_from_video(video_path="carPark.mp4"):
-    try:
-        if not os.path.exists(video_path):
-            return 0, 0
-        pos_list = _load_positions()
-        cap = cv2.VideoCapture(video_path)
-        success, img = cap.read()
-        cap.release()
-        if not success or img is None or len(pos_list) == 0:
-            return 0, len(pos_list)
-
-        # Fixed params to avoid GUI trackbars
-        block_size = 11
-        c_value = 2
-        blur_size = 3
-        width, height = 103, 43
-
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        if blur_size % 2 == 0:
-            blur_size += 1
-        gray = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
-        if block_size % 2 == 0:
-            block_size += 1
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                       cv2.THRESH_BINARY_INV, block_size, c_value)
-
-        available_count = 0
-        for pos in pos_list:
-            x, y = pos
-            w, h = width, height
-            space_crop = thresh[y:y+h, x:x+w]
-            space_orig = img[y:y+h, x:x+w]
-            if space_crop.size == 0 or space_orig.size == 0:
-                continue
-            occupancy_ratio = np.mean(space_crop > 0)
-            gray_space = cv2.cvtColor(space_orig, cv2.COLOR_BGR2GRAY)
-            gray_variance = np.var(gray_space)
-            edges = cv2.Canny(gray_space, 30, 100)
-            edge_density = np.mean(edges > 0)
-
-            if occupancy_ratio < 0.5 and edge_density < 0.1 and gray_variance < 800:
-                available_count += 1
-
-        return available_count, len(pos_list)
-    except Exception:
-        return 0, 0
+def feed_status():
+    # Fetched on every run: editing zones.json replaces the supervisor
+    for name, cam in get_zone_supervisor().snapshot().items():
+        if not cam["running"]:
+            st.warning(f"⚠ {name}: feed stopped")
+        elif cam["updated"] is None:
+            st.caption(f"⏳ {name}: warming up...")
+        else:
+            age = time.time() - cam["updated"]
+            st.caption(f"🎥 {name}: {cam['available']}/{cam['total']} available, "
+                       f"frame {cam['frame']}, updated {age:.1f}s ago")
 
 # -----------------------------
-# Firebase Setup (Realtime DB)
+# Firebase Setup (Realtime DB; PARKING_DB=local for the offline stand-in)
 # -----------------------------
 try:
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("firebase_key.json")
-        firebase_admin.initialize_app(cred, {
-            "databaseURL": "https://smartparkingaihackathon-default-rtdb.firebaseio.com/"
-        })
-    db_ref = db.reference("/")  # root reference
+    db_ref = get_db()  # root reference
 except Exception as e:
     st.error(f"❌ Firebase initialization failed: {e}")
     db_ref = None
@@ -321,7 +281,10 @@ st.set_page_config(page_title="AI Parking App", layout="wide")
 # -----------------------------
 # Session State Defaults
 # -----------------------------
-zones = ["Zone 1", "Zone 2", "Zone 3", "Zone 4", "Zone 5"]
+# Zones, their contacts and camera feeds come from zones.json; a new zone is a config change
+zones = [zone.name for zone in get_zones()]
+
+HEARTBEAT_INTERVAL = 30.0
 
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
@@ -333,16 +296,15 @@ if "role" not in st.session_state:
     st.session_state.role = None  # admin / student
 
 if "statuses" not in st.session_state:
-    st.session_state.statuses = {z: "❌ Occupied" for z in zones}
+    st.session_state.statuses = {}
 
 if "contacts" not in st.session_state:
-    st.session_state.contacts = {
-        "Zone 1": "+91-98982-81627",
-        "Zone 2": "+91-93266-76211",
-        "Zone 3": "+91-73593-18129",
-        "Zone 4": "+91-97246-03166",
-        "Zone 5": "+91-83206-02907",
-    }
+    st.session_state.contacts = {}
+
+# Zones added to the config since this session started get defaults too
+for zone in get_zones():
+    st.session_state.statuses.setdefault(zone.name, "❌ Occupied")
+    st.session_state.contacts.setdefault(zone.name, zone.contact)
 
 if "active_contact" not in st.session_state:
     st.session_state.active_contact = None
@@ -354,7 +316,7 @@ if not st.session_state.logged_in:
     login_page()
 
 # -----------------------------
-# 2) Fetch role from Firebase if logged in
+# 2) Fetch role from Firebase if logged in (login normally sets it already)
 # -----------------------------
 if st.session_state.logged_in and st.session_state.role is None:
     if db_ref is None:
@@ -362,14 +324,8 @@ if st.session_state.logged_in and st.session_state.role is None:
     else:
         user_email = st.session_state.get("user_email")
         try:
-            users_node = db_ref.child("users").get()
-            role = "student"
-            if users_node:
-                for _, user_data in users_node.items():
-                    if user_data.get("email") == user_email:
-                        role = user_data.get("role", "student")
-                        break
-            st.session_state.role = role
+            user = user_record(user_email)
+            st.session_state.role = user["role"] if user else "student"
             st.rerun()
         except Exception as e:
             st.error(f"❌ Failed to fetch role from Firebase: {e}")
@@ -393,17 +349,14 @@ if st.session_state.logged_in:
 
     menu = st.sidebar.radio("Navigation", menu_items)
 
-    # Sync Zone 1 via detector
-    with st.sidebar.expander("Sync Zone 1 from video"):
-        if st.button("Detect now"):
-            available, total = compute_available_from_video("carPark.mp4")
-            # Simple mapping: if any spot is available, mark Zone 1 as available
-            if total > 0 and available > 0:
-                st.session_state.statuses["Zone 1"] = "✅ Available"
-            else:
-                st.session_state.statuses["Zone 1"] = "❌ Occupied"
-            st.success(f"Video scan: {available}/{total} available")
-            st.rerun()
+    # Every configured feed runs in the shared detector pool; zone tiles read their counts
+    with st.sidebar.expander("Camera feeds"):
+        auto_refresh = st.checkbox("Auto-refresh", key="detect_auto_refresh")
+        if auto_refresh:
+            # Only this fragment reruns on the timer, not the whole page
+            fragment(run_every=2)(feed_status)()
+        else:
+            feed_status()
 
     if menu == "View":
         view_page(zones)
@@ -412,22 +365,24 @@ if st.session_state.logged_in:
     elif menu == "Report" and role == "admin":
         report_page()
 
-    # Firebase test write
+    # Firebase test write (heartbeat), at most every HEARTBEAT_INTERVAL seconds per process
     if db_ref is not None:
-        try:
-            test_ref = db_ref.child("test")
-            test_ref.set({
-                "name": st.session_state.get("user_email", "guest"),
-                "status": "Connected successfully 🚀"
-            })
+        writes = get_write_queue()
+        writes.set_throttled("/test", {
+            "name": st.session_state.get("user_email", "guest"),
+            "status": "Connected successfully 🚀"
+        }, HEARTBEAT_INTERVAL)
+        if writes.error:
+            st.sidebar.error(f"❌ Firebase test write failed: {writes.error}")
+        else:
             st.sidebar.success("✅ Firebase connected!")
-        except Exception as e:
-            st.sidebar.error(f"❌ Firebase test write failed: {e}")
     else:
         st.sidebar.warning("⚠ Firebase DB not initialized")
 
     # Logout button
     if st.sidebar.button("Logout"):
+        # Next login re-reads the record, picking up role or password changes
+        invalidate_user(st.session_state.user_email)
         st.session_state.logged_in = False
         st.session_state.user_email = None
         st.session_state.role = None
@@ -0,0 +1,148 @@
+"""Streamlit caching layer shared by app.py and the page modules.
+
+st.cache_resource holds the long-lived, unpicklable objects (one per
+server process): database handles, the reports listener, write queues,
+the user directory and the camera supervisor behind the zone counts.
+st.cache_data holds plain query results (user records, report table
+rows) with a TTL. invalidate_user() drops a user's cached record after
+sign-up or logout; report rows are keyed by the reports cache's delta
+counter, so every change to /reports (local or remote) misses the cache.
+"""
+import atexit
+import os
+import threading
+
+import streamlit as st
+
+import storage
+from camera_supervisor import CameraSupervisor, load_camera_configs, load_zone_configs
+from position_store import journal_path
+from report_queue import ReportQueue
+from reports_cache import ReportsCache, query_reports
+from user_directory import UserDirectory
+from write_queue import WriteBehindQueue
+
+USER_TTL = 300  # Seconds a user record (and role) is reused
+REPORTS_TTL = 60  # Seconds a filtered/sorted reports table is reused
+ZONE_REFRESH_SECONDS = 5  # How often the zone grid fragment redraws itself
+ZONES_CONFIG = os.environ.get("PARKING_ZONES", "zones.json")  # Zones, contacts and their camera feeds
+
+# st.fragment is called st.experimental_fragment before Streamlit 1.37
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+
+@st.cache_resource
+def get_db():
+    """Root database reference (initialises the backend once per process)"""
+    return storage.reference("/")
+
+
+@st.cache_resource
+def get_user_directory():
+    """One cached user lookup per server process, shared by every session"""
+    return UserDirectory(storage.reference("/users"))
+
+
+@st.cache_resource
+def get_reports_cache():
+    """One /reports listener per server process, shared by every session"""
+    return ReportsCache(storage.reference("/reports")).start()
+
+
+@st.cache_resource
+def get_write_queue():
+    """One write-behind queue per server process; writes leave in batches from its thread"""
+    return WriteBehindQueue(storage.reference("/")).start()
+
+
+@st.cache_resource
+def get_report_queue():
+    """One durable report queue per server process, drained by its own thread"""
+    return ReportQueue(storage.reference("/reports")).start()
+
+
+@st.cache_resource
+def _load_zones(path, mtime):
+    return load_zone_configs(path)
+
+
+def get_zones():
+    """Zones from ZONES_CONFIG, reloaded only when the file changes on disk"""
+    return _load_zones(ZONES_CONFIG, os.path.getmtime(ZONES_CONFIG))
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def _layout_key(cameras):
+    """mtimes of every camera's layout file and journal; any picker edit changes it"""
+    return tuple((_mtime(cam.positions), _mtime(journal_path(cam.positions))) for cam in cameras)
+
+
+class _SupervisorSlot:
+    """The running CameraSupervisor and the zones.json and layout mtimes it was started from"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key = None
+        self.supervisor = None
+        atexit.register(self.stop)  # Release the shared memory blocks with the server
+
+    def stop(self):
+        with self.lock:
+            if self.supervisor is not None:
+                self.supervisor.stop()
+                self.supervisor = None
+
+
+@st.cache_resource
+def _supervisor_slot():
+    return _SupervisorSlot()
+
+
+def get_zone_supervisor():
+    """One detector pool per server process running every configured feed, shared by every session.
+
+    Editing zones.json or a camera's layout (the picker's snapshot or
+    journal) starts a new pool and stops the old one, so added feeds and
+    moved slots go live without a server restart. A session still reading
+    the old pool sees its feeds as not running until its next refresh.
+    """
+    slot = _supervisor_slot()
+    cameras = load_camera_configs(ZONES_CONFIG)
+    key = (os.path.getmtime(ZONES_CONFIG), _layout_key(cameras))
+    old = None
+    with slot.lock:
+        if slot.key != key:
+            supervisor = CameraSupervisor(cameras)
+            supervisor.start()
+            old, slot.supervisor, slot.key = slot.supervisor, supervisor, key
+        supervisor = slot.supervisor
+    if old is not None:
+        old.stop()  # Outside the lock: other sessions move on to the new pool meanwhile
+    return supervisor
+
+
+def live_zone_counts():
+    """Live {zone name: {available, total, feeds, live_feeds}} for zones that have camera feeds"""
+    names = {zone.id: zone.name for zone in get_zones()}
+    counts = get_zone_supervisor().zone_counts()
+    return {names[zone]: entry for zone, entry in counts.items() if zone in names}
+
+
+@st.cache_data(ttl=USER_TTL, show_spinner=False)
+def user_record(email):
+    """User record (with role) for email, or None; shared by sessions for USER_TTL seconds"""
+    return get_user_directory().lookup(email)
+
+
+def invalidate_user(email):
+    get_user_directory().invalidate(email)
+    user_record.clear(email)  # Only this user's cached record
+
+
+@st.cache_data(ttl=REPORTS_TTL, max_entries=32, show_spinner=False)
+def report_rows(version, search, status, sort_by, descending):
+    """Filtered, sorted reports table; version (the cache's delta counter) keys out stale results"""
+    return query_reports(get_reports_cache().frame(), search, status, sort_by, descending)
@@ -0,0 +1,260 @@
+"""Reproducible benchmarks for the detection hot path.
+
+Builds synthetic parking-lot frames from carParkImg.png with random car-like
+blobs, runs the headless detector stages and occupancy.compute_available_from_video
+on them, and writes machine-readable results. No network, no GUI.
+
+    python benchmark.py                                   # run, write bench_results.json
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json    # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from layout_format import make_layout, write_layout
+from main import CarParkingDetector, DetectionParams
+from occupancy import compute_available_from_video
+
+DEFAULT_RESOLUTIONS = "1280x720,1920x1080,3840x2160"
+DEFAULT_SLOTS = "50,500,5000"
+SLOT_W, SLOT_H = 103, 43
+
+# Metrics compared against the baseline (higher is worse)
+COMPARED_METRICS = ("decode_ms", "preprocess_ms", "score_ms", "render_ms", "frame_ms", "sync_ms")
+
+
+def grid_positions(n_slots, frame_w, frame_h):
+    """Spread n slots over the frame on an even grid (dense layouts overlap)"""
+    usable_w, usable_h = frame_w - SLOT_W, frame_h - SLOT_H
+    cols = max(1, int(np.ceil(np.sqrt(n_slots * usable_w / max(usable_h, 1)))))
+    rows = -(-n_slots // cols)
+    xs = np.linspace(0, usable_w, cols).astype(int)
+    ys = np.linspace(0, usable_h, rows).astype(int)
+    return [(int(xs[i % cols]), int(ys[i // cols])) for i in range(n_slots)]
+
+
+def paste_car(frame, x, y, color):
+    """Draw a car-like blob (body, windscreen, wheels) inside one slot"""
+    cv2.rectangle(frame, (x + 8, y + 4), (x + SLOT_W - 8, y + SLOT_H - 4), color, -1)
+    cv2.rectangle(frame, (x + 30, y + 8), (x + 60, y + SLOT_H - 8), (40, 40, 40), -1)
+    for wx in (x + 14, x + SLOT_W - 20):
+        cv2.circle(frame, (wx, y + 6), 4, (10, 10, 10), -1)
+        cv2.circle(frame, (wx, y + SLOT_H - 6), 4, (10, 10, 10), -1)
+
+
+def synthetic_frames(background, positions, n_frames, seed, churn=0.02):
+    """Frames where about half the slots hold cars and a few change every frame.
+
+    A car keeps the colour it arrived with until it leaves, so slots that did
+    not flip stay pixel-identical between frames, as a parked car would.
+    """
+    rng = np.random.default_rng(seed)
+    occupied = np.zeros(len(positions), dtype=bool)
+    colors = np.zeros((len(positions), 3), dtype=np.int64)
+    flips = rng.random(len(positions)) < 0.5
+    frame = None
+    frames = []
+    for _ in range(n_frames):
+        if frame is None or flips.any():
+            arrived = flips & ~occupied
+            colors[arrived] = rng.integers(0, 256, (np.count_nonzero(arrived), 3))
+            occupied ^= flips
+            frame = background.copy()
+            for i in np.flatnonzero(occupied):
+                paste_car(frame, positions[i][0], positions[i][1], tuple(colors[i].tolist()))
+        frames.append(frame)  # Unchanged frames share one array; only write_video reads them
+        flips = rng.random(len(positions)) < churn
+    return frames
+
+
+def write_video(path, frames, fps=25):
+    h, w = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000.0
+    return float(np.mean(ms)), float(np.percentile(ms, 50)), float(np.percentile(ms, 95))
+
+
+def run_detector(video_path, pos_path, incremental):
+    """Run the detector over the whole video; per-stage seconds for every frame"""
+    detector = CarParkingDetector(video_path=video_path, headless=True,
+                                  params=DetectionParams(), positions_path=pos_path)
+    detector.warmup_frames = 0  # score from the first frame
+    detector.incremental = incremental
+
+    timings = {"decode": [], "preprocess": [], "score": [], "render": [], "frame": []}
+    while True:
+        t0 = time.perf_counter()
+        success, img = detector.cap.read()
+        t1 = time.perf_counter()
+        if not success:
+            break
+        img_thresh = detector.preprocess_image(img)
+        t2 = time.perf_counter()
+        available, metrics = detector.update_slot_states(img, img_thresh)
+        t3 = time.perf_counter()
+        detector.draw_parking_spaces(img, available, metrics)
+        t4 = time.perf_counter()
+
+        timings["decode"].append(t1 - t0)
+        timings["preprocess"].append(t2 - t1)
+        timings["score"].append(t3 - t2)
+        timings["render"].append(t4 - t3)
+        timings["frame"].append(t4 - t0)
+    detector.cap.release()
+    return timings
+
+
+def bench_case(workdir, background, frame_w, frame_h, n_slots, n_frames, seed, incremental):
+    positions = grid_positions(n_slots, frame_w, frame_h)
+    base = cv2.resize(background, (frame_w, frame_h), interpolation=cv2.INTER_AREA)
+    frames = synthetic_frames(base, positions, n_frames, seed)
+
+    video_path = os.path.join(workdir, f"lot_{frame_w}x{frame_h}_{n_slots}.mp4")
+    pos_path = os.path.join(workdir, f"pos_{n_slots}_{frame_w}x{frame_h}")
+    write_video(video_path, frames)
+    write_layout(pos_path, make_layout(positions))
+
+    timings = run_detector(video_path, pos_path, incremental)
+    # Peak memory comes from a second, untimed pass: tracing slows every allocation
+    tracemalloc.start()
+    run_detector(video_path, pos_path, incremental)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sync_samples = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        compute_available_from_video(video_path, positions_candidates=(pos_path,))
+        sync_samples.append(time.perf_counter() - t0)
+
+    result = {
+        "resolution": f"{frame_w}x{frame_h}",
+        "slots": n_slots,
+        "frames": len(timings["frame"]),
+        "incremental": incremental,
+    }
+    for stage, samples in timings.items():
+        mean, p50, p95 = summarize(samples)
+        result[f"{stage}_ms"] = mean
+        result[f"{stage}_p50_ms"] = p50
+        result[f"{stage}_p95_ms"] = p95
+    result["fps"] = 1000.0 / result["frame_ms"] if result["frame_ms"] else 0.0
+    result["sync_ms"] = summarize(sync_samples)[1]
+    result["peak_traced_mb"] = peak_bytes / 1e6
+    return result
+
+
+def case_key(case):
+    return f"{case['resolution']}/{case['slots']}/{'inc' if case.get('incremental') else 'full'}"
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions beyond tolerance"""
+    previous = {case_key(c): c for c in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(case_key(case))
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric in old and old[metric] > 0 and case[metric] > old[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{case_key(case)} {metric}: {old[metric]:.2f} -> {case[metric]:.2f} ms "
+                    f"(+{(case[metric] / old[metric] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the parking detection hot path")
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS, help="Comma-separated WxH list")
+    parser.add_argument("--slots", default=DEFAULT_SLOTS, help="Comma-separated slot counts")
+    parser.add_argument("--frames", type=int, default=60, help="Frames per case")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--incremental", action="store_true", help="Benchmark incremental mode")
+    parser.add_argument("--image", default="carParkImg.png", help="Background image")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Also write the results as a baseline")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    background = cv2.imread(args.image)
+    if background is None:
+        print(f"Error: Could not load {args.image}")
+        return 2
+
+    resolutions = [tuple(int(v) for v in r.split("x")) for r in args.resolutions.split(",")]
+    slot_counts = [int(n) for n in args.slots.split(",")]
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "frames": args.frames,
+        "seed": args.seed,
+        "cases": [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for frame_w, frame_h in resolutions:
+            for n_slots in slot_counts:
+                case = bench_case(workdir, background, frame_w, frame_h, n_slots,
+                                  args.frames, args.seed, args.incremental)
+                results["cases"].append(case)
+                print(f"{case_key(case):<24} {case['fps']:>7.1f} fps  "
+                      f"pre {case['preprocess_ms']:6.2f}  score {case['score_ms']:6.2f}  "
+                      f"render {case['render_ms']:6.2f}  sync {case['sync_ms']:7.2f} ms  "
+                      f"peak {case['peak_traced_mb']:6.1f} MB")
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["peak_rss_mb"] = maxrss / (1e6 if sys.platform == "darwin" else 1e3)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ PERFORMANCE REGRESSION")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
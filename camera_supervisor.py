@@ -0,0 +1,320 @@
+import argparse
+import cv2
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from main import CarParkingDetector, DetectionParams
+from position_store import load_layout
+
+# Per-camera shared block: int64 header followed by one uint8 state per slot
+HEADER_FIELDS = ("seq", "frame", "available", "total", "updated_ns", "running")
+HEADER_BYTES = len(HEADER_FIELDS) * 8
+SEQ, FRAME, AVAILABLE, TOTAL, UPDATED_NS, RUNNING = range(len(HEADER_FIELDS))
+READ_TIMEOUT = 0.05  # Seconds a block may stay mid-write before it counts as abandoned
+
+
+@dataclass
+class CameraConfig:
+    """One camera stream with its own position file and detection parameters.
+
+    Slots whose layout zone id is 0 (unassigned) count towards zone; file
+    sources with loop=True restart at the end like a live feed.
+    """
+    name: str
+    video: str
+    positions: str = 'CarParkPos'
+    params: DetectionParams = field(default_factory=DetectionParams)
+    zone: int = 0
+    loop: bool = False
+
+
+@dataclass
+class ZoneConfig:
+    """A parking zone shown in the app; its slots may come from any number of cameras"""
+    id: int
+    name: str
+    contact: str = ""
+
+
+def _resolve_positions(value):
+    """A position file name, or the first existing one of a list of candidates"""
+    if isinstance(value, str):
+        return value
+    return next((p for p in value if os.path.exists(p)), value[0])
+
+
+def load_camera_configs(path):
+    """Read cameras from a JSON file: {"cameras": [{"name", "video", "positions", "params", "zone", "loop"}]}"""
+    with open(path) as f:
+        config = json.load(f)
+    cameras = []
+    for cam in config.get("cameras", []):
+        cameras.append(CameraConfig(
+            name=cam["name"],
+            video=cam["video"],
+            positions=_resolve_positions(cam.get("positions", 'CarParkPos')),
+            params=DetectionParams(**cam.get("params", {})),
+            zone=int(cam.get("zone", 0)),
+            loop=bool(cam.get("loop", False)),
+        ))
+    return cameras
+
+
+def load_zone_configs(path):
+    """Read zones from the same JSON file: {"zones": [{"id", "name", "contact"}]}"""
+    with open(path) as f:
+        config = json.load(f)
+    return [ZoneConfig(id=int(z["id"]), name=z["name"], contact=z.get("contact", ""))
+            for z in config.get("zones", [])]
+
+
+def _slot_zones(cam):
+    """Zone id of every slot in the camera's layout (unassigned slots get cam.zone)"""
+    try:
+        zones = load_layout(cam.positions)["zone"].astype(np.int64)
+    except Exception:
+        return np.zeros(0, dtype=np.int64)
+    zones[zones == 0] = cam.zone
+    return zones
+
+
+def _block_views(shm, n_slots):
+    header = np.ndarray((len(HEADER_FIELDS),), dtype=np.int64, buffer=shm.buf)
+    states = np.ndarray((n_slots,), dtype=np.uint8, buffer=shm.buf, offset=HEADER_BYTES)
+    return header, states
+
+
+def _worker_main(cameras, blocks, stop_event):
+    """Run a group of cameras round-robin inside one worker process"""
+    # One OpenCV thread per process; parallelism comes from the pool itself
+    cv2.setNumThreads(1)
+
+    running = []
+    try:
+        for cam, (shm_name, n_slots) in zip(cameras, blocks):
+            # Children share the supervisor's resource tracker, so attaching is safe
+            shm = shared_memory.SharedMemory(name=shm_name)
+            header, states = _block_views(shm, n_slots)
+            try:
+                detector = CarParkingDetector(video_path=cam.video, headless=True, params=cam.params,
+                                              positions_path=cam.positions)
+                usable = detector.cap.isOpened() and len(detector.posList) == n_slots
+            except Exception as e:
+                print(f"Camera {cam.name} failed to start: {e}")
+                usable = False
+            if not usable:
+                header[RUNNING] = 0
+                shm.close()
+                continue
+            header[RUNNING] = 1
+            running.append((cam.name, detector, shm, header, states, cam.loop))
+
+        while running and not stop_event.is_set():
+            for entry in list(running):
+                name, detector, shm, header, states, loop = entry
+                try:
+                    success, img = detector.read_frame()
+                    if not success and loop and detector.cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0:
+                        detector.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        success, img = detector.read_frame()
+                    slot_state = detector.process(img) if success else None
+                except Exception as e:
+                    print(f"Camera {name} stopped: {e}")
+                    success = False
+                if not success:
+                    header[RUNNING] = 0
+                    detector.cap.release()
+                    shm.close()
+                    running.remove(entry)
+                    continue
+
+                # Seqlock: odd while writing so readers retry instead of tearing
+                header[SEQ] += 1
+                states[:] = slot_state
+                header[FRAME] = detector.frame_count
+                header[AVAILABLE] = int(states.sum())
+                header[UPDATED_NS] = time.time_ns()
+                header[SEQ] += 1
+    finally:
+        # Whatever ends the worker, its feeds must not keep reporting as live
+        for _, detector, shm, header, states, _ in running:
+            header[RUNNING] = 0
+            detector.cap.release()
+            shm.close()
+
+
+class CameraSupervisor:
+    """Runs one headless detector per camera across a pool of worker processes.
+
+    Slot states and counts are written by the workers into one shared memory
+    block per camera, so nothing is pickled per frame; snapshot() reads the
+    blocks in-process and aggregates them, and zone_counts() sums the slot
+    states per zone id, so reading stays cheap however many feeds run.
+
+    Workers are spawned rather than forked, so they never inherit the
+    server's threads or locks. stop() unmaps the blocks under the same lock
+    that readers copy them under, so a reader on another thread gets a
+    not-running feed instead of touching freed memory.
+    """
+
+    def __init__(self, cameras, workers=None):
+        self.cameras = list(cameras)
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.cameras) or 1))
+        self.blocks = {}
+        self.views = {}
+        self.slot_zones = {}  # Camera name -> zone id per slot
+        self.processes = []
+        self.processes_by_camera = {}
+        self.context = mp.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.lock = threading.Lock()  # Held while the blocks are read or unmapped
+
+    def start(self):
+        for cam in self.cameras:
+            self.slot_zones[cam.name] = _slot_zones(cam)
+            n_slots = len(self.slot_zones[cam.name])
+            shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + max(n_slots, 1))
+            header, states = _block_views(shm, n_slots)
+            header[:] = 0
+            header[TOTAL] = n_slots
+            header[RUNNING] = 1
+            self.blocks[cam.name] = (shm, n_slots)
+            self.views[cam.name] = (header, states)
+
+        # Spread cameras round-robin so every worker gets a similar load
+        groups = [self.cameras[i::self.workers] for i in range(self.workers)]
+        for i, group in enumerate(groups):
+            blocks = [(self.blocks[cam.name][0].name, self.blocks[cam.name][1]) for cam in group]
+            proc = self.context.Process(target=_worker_main, args=(group, blocks, self.stop_event),
+                              name=f"detector-{i}", daemon=True)
+            proc.start()
+            self.processes.append(proc)
+            for cam in group:
+                self.processes_by_camera[cam.name] = proc
+        print(f"Started {len(self.cameras)} cameras on {self.workers} worker processes")
+
+    def _read(self, name):
+        """Consistent (header, slot states) copies of one camera's block.
+
+        A feed whose worker died (or stopped mid-write, leaving SEQ odd) is
+        reported with RUNNING cleared instead of being read forever.
+        """
+        with self.lock:
+            if name not in self.views:
+                return np.zeros(len(HEADER_FIELDS), dtype=np.int64), np.zeros(0, dtype=np.uint8)
+            header, states = self.views[name]
+            deadline = time.monotonic() + READ_TIMEOUT
+            while time.monotonic() < deadline:
+                seq = header[SEQ]
+                if seq % 2 == 0:
+                    values = header.copy()
+                    slots = states.copy()
+                    if header[SEQ] == seq:
+                        proc = self.processes_by_camera.get(name)
+                        if proc is not None and not proc.is_alive():
+                            values[RUNNING] = 0
+                        return values, slots
+                time.sleep(0)
+            values = header.copy()
+            values[RUNNING] = 0
+            return values, states.copy()
+
+    def snapshot(self, include_slots=False):
+        """Per-camera counts: {name: {available, occupied, total, frame, updated, running}}"""
+        view = {}
+        for cam in self.cameras:
+            values, slots = self._read(cam.name)
+            entry = {
+                "available": int(values[AVAILABLE]),
+                "occupied": int(values[TOTAL] - values[AVAILABLE]),
+                "total": int(values[TOTAL]),
+                "frame": int(values[FRAME]),
+                "updated": values[UPDATED_NS] / 1e9 if values[UPDATED_NS] else None,
+                "running": bool(values[RUNNING]),
+            }
+            if include_slots:
+                entry["slots"] = slots.tolist()
+            view[cam.name] = entry
+        return view
+
+    def zone_counts(self):
+        """Per zone id: {available, total, feeds, live_feeds}, over cameras that have produced a frame"""
+        counts = {}
+        for cam in self.cameras:
+            values, slots = self._read(cam.name)
+            zones = self.slot_zones[cam.name]
+            live = bool(values[RUNNING] and values[UPDATED_NS] > 0)
+            for zone in np.unique(zones):
+                entry = counts.setdefault(int(zone), {"available": 0, "total": 0, "feeds": 0, "live_feeds": 0})
+                entry["feeds"] += 1
+                entry["live_feeds"] += live
+            if not live or len(zones) == 0:
+                continue
+            available = np.bincount(zones, weights=slots, minlength=zones.max() + 1)
+            total = np.bincount(zones, minlength=zones.max() + 1)
+            for zone in np.flatnonzero(total):
+                counts[int(zone)]["available"] += int(available[zone])
+                counts[int(zone)]["total"] += int(total[zone])
+        return counts
+
+    def totals(self):
+        snap = self.snapshot()
+        available = sum(c["available"] for c in snap.values())
+        total = sum(c["total"] for c in snap.values())
+        return available, total - available, total
+
+    def is_running(self):
+        return any(proc.is_alive() for proc in self.processes)
+
+    def stop(self):
+        self.stop_event.set()
+        for proc in self.processes:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self.processes = []
+        with self.lock:
+            # Drop the views first so no reader touches a block once it is unmapped
+            self.views = {}
+            for shm, _ in self.blocks.values():
+                shm.close()
+                shm.unlink()
+            self.blocks = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run detectors for many cameras in parallel")
+    parser.add_argument("config", help="JSON file listing cameras")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between summaries")
+    args = parser.parse_args()
+
+    zone_names = {z.id: z.name for z in load_zone_configs(args.config)}
+    supervisor = CameraSupervisor(load_camera_configs(args.config), workers=args.workers)
+    supervisor.start()
+    try:
+        while supervisor.is_running():
+            time.sleep(args.interval)
+            for name, cam in supervisor.snapshot().items():
+                print(f"{name:<20} {cam['available']:>4}/{cam['total']:<4} available  frame {cam['frame']}")
+            for zone, counts in sorted(supervisor.zone_counts().items()):
+                print(f"{zone_names.get(zone, f'zone {zone}'):<20} {counts['available']:>4}/{counts['total']:<4} "
+                      f"available  ({counts['live_feeds']}/{counts['feeds']} feeds live)")
+            available, occupied, total = supervisor.totals()
+            print(f"{'ALL':<20} {available:>4}/{total:<4} available, {occupied} occupied")
+            print("-" * 40)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Latency/throughput benchmark of the app's database paths against local_db.
+
+Seeds a LocalDatabase from database.json (plus synthetic users and
+reports), injects a round-trip latency and failure rate, and times the
+login lookup, report submission and the reports table. No network.
+
+    python db_benchmark.py --latency 0.08 --jitter 0.02 --users 50000 --reports 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from local_db import LocalDatabase, LocalDatabaseError
+from report_queue import ReportQueue
+from reports_cache import ReportsCache, query_reports
+from user_directory import UserDirectory
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000.0
+    return {"mean_ms": float(np.mean(ms)), "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95))}
+
+
+def seeded_database(args):
+    with open(args.seed_file, encoding="utf-8") as f:
+        data = json.load(f)
+    rng = np.random.default_rng(args.seed)
+    users = data.setdefault("users", {})
+    for i in range(args.users):
+        users[f"bench{i}"] = {"email": f"user{i}@example.com", "password": "secret", "role": "student"}
+    reports = data.setdefault("reports", {})
+    for i in range(args.reports):
+        plate = f"GJ{i % 100:02d}BK{i:04d}"
+        reports[plate] = {"vehicle_number": plate, "type": "4 wheeler",
+                          "violations": int(rng.integers(0, 9)), "fine": 0, "status": "unpaid"}
+    return LocalDatabase(data, latency=args.latency, jitter=args.jitter,
+                         failure_rate=args.failure_rate, seed=args.seed)
+
+
+def bench_login(database, args):
+    directory = UserDirectory(database.reference("/users"))
+    cold, warm = [], []
+    failed = 0
+    for i in range(args.logins):
+        email = f"user{(i * 7919) % max(args.users, 1)}@example.com" if args.users else "admin@gmail.com"
+        try:
+            t0 = time.perf_counter()
+            directory.authenticate(email, "secret")
+            t1 = time.perf_counter()
+            directory.authenticate(email, "secret")
+            t2 = time.perf_counter()
+        except LocalDatabaseError:
+            failed += 1
+            continue
+        cold.append(t1 - t0)
+        warm.append(t2 - t1)
+    if not cold:
+        return {"failed": failed}
+    return {"cold": summarize(cold), "cached": summarize(warm), "failed": failed}
+
+
+def bench_reports(database, args, workdir):
+    """Concurrent sessions, each with its own durable queue, all reporting one hot plate"""
+    queues = [ReportQueue(database.reference("/reports"), os.path.join(workdir, f"queue{s}.journal")).start()
+              for s in range(args.sessions)]
+    submit = []
+    before = database.peek(f"/reports/{args.hot_plate}/violations") or 0
+
+    def session(q):
+        for _ in range(args.submissions):
+            t0 = time.perf_counter()
+            q.submit(args.hot_plate, "4 wheeler")
+            submit.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(q,)) for q in queues]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    while any(len(q) for q in queues):
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    for q in queues:
+        q.stop()
+
+    total = args.sessions * args.submissions
+    after = database.peek(f"/reports/{args.hot_plate}/violations")
+    return {"submit": summarize(submit), "reports": total, "drain_s": elapsed,
+            "reports_per_s": total / elapsed, "lost": before + total - after}
+
+
+def bench_table(database, args):
+    t0 = time.perf_counter()
+    cache = ReportsCache(database.reference("/reports")).start()
+    seeded = time.perf_counter() - t0
+    renders = []
+    for i in range(args.renders):
+        t1 = time.perf_counter()
+        matches = query_reports(cache.frame(), search="BK" if i % 2 else "", status="unpaid",
+                                sort_by="Violations", descending=True)
+        matches.iloc[:50].to_dict("records")  # One page leaves for the browser
+        renders.append(time.perf_counter() - t1)
+    cache.stop()
+    return {"seed_ms": seeded * 1000.0, "rows": len(cache.reports), "render": summarize(renders)}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark database paths against the local stand-in")
+    parser.add_argument("--seed-file", default="database.json")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per round trip")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds per round trip")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of round trips that fail")
+    parser.add_argument("--users", type=int, default=10000, help="Synthetic users to add")
+    parser.add_argument("--reports", type=int, default=10000, help="Synthetic reports to add")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent reporting sessions")
+    parser.add_argument("--submissions", type=int, default=10, help="Reports per session")
+    parser.add_argument("--hot-plate", default="GJ05AB1234", help="Plate every session reports")
+    parser.add_argument("--renders", type=int, default=20, help="Reports table renders")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="db_bench_results.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    database = seeded_database(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {
+            "config": vars(args),
+            "login": bench_login(database, args),
+            "report_submit": bench_reports(database, args, workdir),
+            "reports_table": bench_table(database, args),
+            "round_trips": dict(database.calls),
+        }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    login, submit, table = results["login"], results["report_submit"], results["reports_table"]
+    if "cold" in login:
+        print(f"🔑 Login: {login['cold']['p50_ms']:.1f} ms cold, {login['cached']['p50_ms']:.3f} ms cached (p50), "
+              f"{login['failed']} failed")
+    print(f"📝 Reports: submit p95 {submit['submit']['p95_ms']:.2f} ms, "
+          f"{submit['reports_per_s']:.1f} reports/s drained, {submit['lost']} lost")
+    print(f"📋 Table: seeded {table['rows']} rows in {table['seed_ms']:.0f} ms, "
+          f"render p50 {table['render']['p50_ms']:.1f} ms")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
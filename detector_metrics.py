@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Stages of CarParkingDetector.run, in loop order
+STAGES = ("decode", "preprocess", "score", "overlay", "display")
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingWindow:
+    """Last `size` samples in a preallocated ring; recording is one store"""
+
+    def __init__(self, size=1024):
+        self.samples = np.zeros(size, dtype=np.float64)
+        self.size = size
+        self.index = 0
+        self.count = 0  # Lifetime number of samples
+        self.total = 0.0  # Lifetime sum
+
+    def add(self, value):
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % self.size
+        self.count += 1
+        self.total += value
+
+    def values(self):
+        return self.samples[:min(self.count, self.size)].copy()
+
+    def quantiles(self, qs=QUANTILES):
+        values = self.values()
+        if values.size == 0:
+            return [0.0] * len(qs)
+        return [float(v) for v in np.quantile(values, qs)]
+
+
+class DetectorMetrics:
+    """Per-stage latency windows, frame counters and slot gauges for one detector.
+
+    Cheap enough to leave on: a stage measurement is two perf_counter calls
+    and one array store. Percentiles are only computed when someone reads them.
+    """
+
+    def __init__(self, window=1024):
+        self.stages = {stage: RollingWindow(window) for stage in STAGES}
+        self.frame_times = RollingWindow(window)  # perf_counter at the end of each frame
+        self.frames = 0
+        self.available = 0
+        self.total = 0
+        self.started = time.time()
+
+    def record(self, stage, seconds):
+        window = self.stages.get(stage)
+        if window is None:
+            window = self.stages[stage] = RollingWindow(self.frame_times.size)
+        window.add(seconds)
+
+    def frame_done(self, available=None, total=None):
+        self.frames += 1
+        self.frame_times.add(time.perf_counter())
+        if available is not None:
+            self.available = available
+        if total is not None:
+            self.total = total
+
+    def fps(self):
+        stamps = self.frame_times.values()
+        if stamps.size < 2:
+            return 0.0
+        span = stamps.max() - stamps.min()
+        return (stamps.size - 1) / span if span > 0 else 0.0
+
+    def snapshot(self):
+        """Plain dict of the current counters (milliseconds for latencies)"""
+        stages = {}
+        for stage, window in list(self.stages.items()):
+            if window.count == 0:
+                continue
+            p50, p95, p99 = window.quantiles()
+            stages[stage] = {
+                "p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000,
+                "mean_ms": window.total / window.count * 1000, "count": window.count,
+            }
+        return {
+            "time": time.time(),
+            "frames": self.frames,
+            "fps": self.fps(),
+            "available": self.available,
+            "occupied": self.total - self.available,
+            "total": self.total,
+            "stages": stages,
+        }
+
+    def prometheus_text(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            "# HELP parking_stage_latency_seconds Detector loop stage latency over the recent window",
+            "# TYPE parking_stage_latency_seconds summary",
+        ]
+        for stage, window in list(self.stages.items()):
+            if window.count == 0:
+                continue
+            for q, value in zip(QUANTILES, window.quantiles()):
+                lines.append(f'parking_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} {value:.9f}')
+            lines.append(f'parking_stage_latency_seconds_sum{{stage="{stage}"}} {window.total:.9f}')
+            lines.append(f'parking_stage_latency_seconds_count{{stage="{stage}"}} {window.count}')
+
+        lines += [
+            "# HELP parking_frames_total Frames processed by the detector",
+            "# TYPE parking_frames_total counter",
+            f"parking_frames_total {self.frames}",
+            "# HELP parking_fps Frames per second over the recent window",
+            "# TYPE parking_fps gauge",
+            f"parking_fps {self.fps():.3f}",
+            "# HELP parking_slots_available Slots currently available",
+            "# TYPE parking_slots_available gauge",
+            f"parking_slots_available {self.available}",
+            "# HELP parking_slots_total Slots monitored",
+            "# TYPE parking_slots_total gauge",
+            f"parking_slots_total {self.total}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics, port=9108, host="127.0.0.1"):
+    """Serve metrics.prometheus_text() on http://host:port/metrics from a daemon thread"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of the terminal display
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Metrics available at http://{host}:{server.server_port}/metrics")
+    return server
+
+
+class JsonlDumper:
+    """Append a metrics snapshot to a JSON-lines file every `interval` seconds"""
+
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="metrics-jsonl", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def dump(self):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(self.metrics.snapshot()) + "\n")
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.dump()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=1)
+        self.dump()
@@ -0,0 +1,181 @@
+import cv2
+import threading
+import time
+from collections import deque
+
+
+class FrameRing:
+    """Bounded buffer between two pipeline stages.
+
+    With drop_oldest=True a full ring discards its oldest item so a live feed
+    never falls behind real time; otherwise put() blocks until there is room.
+    """
+
+    def __init__(self, depth=4, drop_oldest=True):
+        self.depth = max(1, depth)
+        self.drop_oldest = drop_oldest
+        self.items = deque()
+        self.dropped = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def put(self, item):
+        with self.cond:
+            while not self.drop_oldest and len(self.items) >= self.depth and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                return False
+            if len(self.items) >= self.depth:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify_all()
+            return True
+
+    def get(self):
+        """Next item, or None once the ring is closed and drained"""
+        with self.cond:
+            while not self.items and not self.closed:
+                self.cond.wait()
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class FramePipeline:
+    """Decode-ahead pipeline around a CarParkingDetector.
+
+    Stage 1 (capture thread) decodes frames into a bounded ring (skipping
+    frames without decoding when the detector has a frame stride), stage 2
+    (worker thread) preprocesses and updates slot states, and stage 3 (the
+    calling thread) renders and handles keys. OpenCV releases the GIL inside
+    read/cvtColor/adaptiveThreshold/Canny, so decode and compute overlap.
+    HighGUI stays on the calling thread; with render=False the last stage
+    only updates the terminal.
+    """
+
+    def __init__(self, detector, queue_depth=4, drop_oldest=True, render=True):
+        self.detector = detector
+        self.render = render
+        self.frames = FrameRing(queue_depth, drop_oldest)
+        self.results = FrameRing(queue_depth, drop_oldest)
+        self.stop_event = threading.Event()
+
+        # Trackbars are read on the GUI thread and handed to the worker
+        self.params = detector.get_params()
+
+        self.decoded = 0
+        self.processed = 0
+
+    def _capture_loop(self):
+        detector = self.detector
+        metrics = detector.metrics
+        while not self.stop_event.is_set():
+            t0 = time.perf_counter()
+            success, img = detector.read_frame()
+            if not success:
+                break
+            metrics.record("decode", time.perf_counter() - t0)
+            self.decoded += 1
+            self.frames.put(img)
+        self.frames.close()
+
+    def _detect_loop(self):
+        detector = self.detector
+        while True:
+            img = self.frames.get()
+            if img is None:
+                break
+            t0 = time.perf_counter()
+            img_thresh = detector.preprocess_image(img, self.params)
+            t1 = time.perf_counter()
+            available_count, metrics = detector.update_slot_states(img, img_thresh)
+            t2 = time.perf_counter()
+            detector.metrics.record("preprocess", t1 - t0)
+            detector.metrics.record("score", t2 - t1)
+            detector.metrics.frame_done(available_count, len(detector.posList))
+            self.processed += 1
+
+            if self.render:
+                result = (img, img_thresh, available_count, metrics, detector.slot_state.copy())
+            else:
+                result = (None, None, available_count, None, None)
+            if not self.results.put(result):
+                break
+        self.results.close()
+
+    def stop(self):
+        self.stop_event.set()
+        self.frames.close()
+        self.results.close()
+
+    def run(self, report_fps=False):
+        detector = self.detector
+        print(f"Starting pipelined car parking detection "
+              f"(queue depth {self.frames.depth}, "
+              f"{'drop-oldest' if self.frames.drop_oldest else 'blocking'})...")
+
+        threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._detect_loop, name="detect", daemon=True),
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+
+        available_spaces = 0
+        try:
+            while True:
+                result = self.results.get()
+                if result is None:
+                    break
+                img, img_thresh, available_spaces, metrics, slot_state = result
+
+                if detector.frame_count - detector.last_terminal_update >= detector.terminal_update_interval:
+                    if self.render:
+                        detector.update_terminal_display(available_spaces)
+                    elif report_fps:
+                        elapsed = time.perf_counter() - start
+                        print(f"Frame {detector.frame_count}: {self.processed / elapsed:.1f} fps, "
+                              f"{self.frames.dropped} dropped")
+                    detector.last_terminal_update = detector.frame_count
+
+                if not self.render:
+                    continue
+
+                if detector.show_stats or detector.show_list:
+                    detector.print_occupancy_demo(available_spaces)
+
+                t0 = time.perf_counter()
+                img = detector.draw_parking_spaces(img, available_spaces, metrics, slot_state)
+                t1 = time.perf_counter()
+                cv2.imshow("Parking Detection", img)
+                cv2.imshow("Threshold", img_thresh)
+
+                key = cv2.waitKey(1) & 0xFF
+                detector.metrics.record("overlay", t1 - t0)
+                detector.metrics.record("display", time.perf_counter() - t1)
+                self.params = detector.get_params()
+                if not detector.handle_key(key):
+                    break
+        finally:
+            self.stop()
+            for t in threads:
+                t.join()
+            detector.cap.release()
+            if self.render:
+                cv2.destroyAllWindows()
+
+        elapsed = time.perf_counter() - start
+        if report_fps and elapsed > 0:
+            print(f"Decoded {self.decoded} frames, processed {self.processed} "
+                  f"({self.processed / elapsed:.1f} fps), dropped {self.frames.dropped + self.results.dropped}")
+        print("Program ended.")
+        return available_spaces
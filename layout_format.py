@@ -0,0 +1,209 @@
+"""Versioned binary slot layout.
+
+A layout file is a 64-byte header followed by a packed array of LAYOUT_DTYPE
+records, so large layouts open instantly with np.memmap and nothing is
+unpickled. Slot polygons (CarParkPolygons) use the same kind of header
+followed by per-polygon corner counts and float32 corners. Legacy pickles
+of either are still read, through an unpickler that refuses every global;
+layouts can be converted:
+
+    python layout_format.py CarParkPos.unknown CarParkPos
+"""
+import io
+import os
+import pickle
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+MAGIC = b"PKSLOTS\x00"
+POLYGON_MAGIC = b"PKPOLYS\x00"
+LAYOUT_VERSION = 1
+HEADER_SIZE = 64
+# magic, version, record size, record count, snapshot id (0 in files written before ids)
+HEADER_FORMAT = "<8sIIQQ"
+# magic, version, polygon count, total corner count
+POLYGON_HEADER_FORMAT = "<8sIQQ"
+
+LAYOUT_DTYPE = np.dtype([
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("w", "<u2"),
+    ("h", "<u2"),
+    ("zone", "<u2"),
+    ("camera", "<u2"),
+])
+
+DEFAULT_WIDTH, DEFAULT_HEIGHT = 103, 43
+
+
+class LayoutError(ValueError):
+    """The file is neither a supported layout nor a legacy position list"""
+
+
+class _PositionsUnpickler(pickle.Unpickler):
+    """Legacy position lists only contain lists, tuples and ints; refuse anything else"""
+
+    def find_class(self, module, name):
+        raise LayoutError(f"legacy layout references {module}.{name}; refusing to load it")
+
+
+def make_layout(pos_list, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT, zone=0, camera=0):
+    """Layout records for (x, y) positions; the other fields may be scalars or per-slot arrays"""
+    pos = np.asarray(pos_list, dtype=np.int64).reshape(-1, 2)
+    layout = np.zeros(len(pos), dtype=LAYOUT_DTYPE)
+    layout["x"], layout["y"] = pos[:, 0], pos[:, 1]
+    layout["w"], layout["h"] = width, height
+    layout["zone"], layout["camera"] = zone, camera
+    return layout
+
+
+def positions(layout):
+    """(x, y) tuples in layout order, the form the detector and picker work with"""
+    return list(zip(layout["x"].tolist(), layout["y"].tolist()))
+
+
+def read_snapshot(path, mmap=True):
+    """(layout, snapshot id) from a layout file (memory-mapped, read-only) or a legacy pickle.
+
+    Header and records come from the same open file, so a snapshot renamed
+    into place meanwhile cannot pair one file's id with the other's records.
+    Legacy pickles have snapshot id 0. Raises FileNotFoundError for a
+    missing file and LayoutError for anything that is not a layout.
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+        if not header.startswith(MAGIC):
+            f.seek(0)
+            return _read_legacy(f), 0
+
+        if len(header) < HEADER_SIZE:
+            raise LayoutError(f"{path}: truncated header")
+        _, version, record_size, count, snapshot = struct.unpack_from(HEADER_FORMAT, header)
+        if version != LAYOUT_VERSION or record_size != LAYOUT_DTYPE.itemsize:
+            raise LayoutError(f"{path}: unsupported layout version {version}")
+        if os.fstat(f.fileno()).st_size < HEADER_SIZE + count * record_size:
+            raise LayoutError(f"{path}: truncated records")
+
+        if count == 0:
+            return np.zeros(0, dtype=LAYOUT_DTYPE), snapshot
+        if mmap:
+            return np.memmap(f, dtype=LAYOUT_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,)), snapshot
+        return np.fromfile(f, dtype=LAYOUT_DTYPE, count=count), snapshot
+
+
+def read_layout(path, mmap=True):
+    """Load a layout file (memory-mapped, read-only) or a legacy pickle"""
+    return read_snapshot(path, mmap)[0]
+
+
+def _read_legacy(f):
+    try:
+        pos_list = _PositionsUnpickler(f).load()
+        return make_layout(pos_list)
+    except LayoutError:
+        raise
+    except Exception as e:
+        raise LayoutError(f"not a slot layout: {e}") from e
+
+
+def layout_bytes(layout, snapshot=0):
+    layout = np.ascontiguousarray(layout, dtype=LAYOUT_DTYPE)
+    header = struct.pack(HEADER_FORMAT, MAGIC, LAYOUT_VERSION, LAYOUT_DTYPE.itemsize, len(layout), snapshot)
+    return header.ljust(HEADER_SIZE, b"\x00") + layout.tobytes()
+
+
+def _umask():
+    # os.umask can only be read by setting it; done once, before any writer threads exist
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Mode open() would give a new file; mkstemp's temp files start out 0600
+FILE_MODE = 0o666 & ~_umask()
+
+
+def write_temp(path, data):
+    """Write bytes to a synced temp file next to path and return its name"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.chmod(tmp, FILE_MODE)  # The renamed file should be readable like any other the app writes
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def atomic_write(path, data):
+    """Write bytes to path via a temp file in the same directory and os.replace"""
+    os.replace(write_temp(path, data), path)
+
+
+def polygon_bytes(polygons):
+    """Polygons (sequences of (x, y) corners) in the versioned polygon format"""
+    polygons = [np.asarray(p, dtype=np.float32).reshape(-1, 2) for p in polygons]
+    counts = np.array([len(p) for p in polygons], dtype="<u4")
+    corners = np.concatenate(polygons) if polygons else np.zeros((0, 2), dtype=np.float32)
+    header = struct.pack(POLYGON_HEADER_FORMAT, POLYGON_MAGIC, LAYOUT_VERSION, len(polygons), len(corners))
+    return header.ljust(HEADER_SIZE, b"\x00") + counts.tobytes() + corners.astype("<f4").tobytes()
+
+
+def read_polygons(path):
+    """Slot polygons as float32 (n, 2) corner arrays, from a polygon file or a legacy pickle.
+
+    Raises FileNotFoundError for a missing file and LayoutError for
+    anything that is not a polygon list.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(POLYGON_MAGIC):
+        try:
+            polygons = _PositionsUnpickler(io.BytesIO(data)).load()
+            return [np.asarray(p, dtype=np.float32).reshape(-1, 2) for p in polygons]
+        except LayoutError:
+            raise
+        except Exception as e:
+            raise LayoutError(f"not a polygon list: {e}") from e
+
+    if len(data) < HEADER_SIZE:
+        raise LayoutError(f"{path}: truncated header")
+    _, version, count, total = struct.unpack_from(POLYGON_HEADER_FORMAT, data)
+    if version != LAYOUT_VERSION:
+        raise LayoutError(f"{path}: unsupported polygon version {version}")
+    corners_at = HEADER_SIZE + 4 * count
+    if len(data) < corners_at + 8 * total:
+        raise LayoutError(f"{path}: truncated polygons")
+    counts = np.frombuffer(data, dtype="<u4", count=count, offset=HEADER_SIZE)
+    if counts.sum() != total:
+        raise LayoutError(f"{path}: corner counts do not add up")
+    corners = np.frombuffer(data, dtype="<f4", count=2 * total, offset=corners_at).reshape(-1, 2)
+    return [p.astype(np.float32) for p in np.split(corners, np.cumsum(counts)[:-1])] if count else []
+
+
+def write_layout(path, layout):
+    """Write a layout through a temp file and atomic rename"""
+    atomic_write(path, layout_bytes(layout))
+
+
+def convert_legacy(src, dst):
+    """Convert a legacy CarParkPos pickle to the layout format; returns the slot count"""
+    with open(src, "rb") as f:
+        layout = _read_legacy(io.BytesIO(f.read()))
+    write_layout(dst, layout)
+    return len(layout)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python layout_format.py LEGACY_PICKLE OUTPUT")
+        sys.exit(2)
+    count = convert_legacy(sys.argv[1], sys.argv[2])
+    print(f"Converted {count} parking positions to {sys.argv[2]} (layout v{LAYOUT_VERSION})")
@@ -0,0 +1,333 @@
+"""In-process stand-in for the Firebase Realtime Database.
+
+LocalDatabase keeps the tree as nested dicts and hands out references with
+the subset of the firebase_admin.db API this app uses: child, get, set,
+update (multi-path), push, delete, transaction, listen and
+order_by_child(...).equal_to(...) queries. Every call that would be a
+network round trip sleeps for latency (+ random jitter) and fails with
+probability failure_rate, so page latency and throughput can be measured
+offline under realistic RTTs:
+
+    db = LocalDatabase.from_file("database.json", latency=0.08, failure_rate=0.01)
+    users = db.reference("/users").order_by_child("email").equal_to("admin@gmail.com").get()
+"""
+import copy
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+# Attempts before a contended transaction gives up (the firebase_admin limit)
+TRANSACTION_RETRIES = 25
+
+
+class LocalDatabaseError(Exception):
+    """Injected failure (the local equivalent of an unavailable backend)"""
+
+
+class TransactionAbortedError(LocalDatabaseError):
+    """A transaction kept losing to concurrent writers"""
+
+
+def _split(path):
+    return [k for k in path.split("/") if k]
+
+
+def _prune(value):
+    """Drop None values and empty dicts, as the database never stores them"""
+    if not isinstance(value, dict):
+        return value
+    pruned = {}
+    for key, child in value.items():
+        child = _prune(child)
+        if child is not None and child != {}:
+            pruned[str(key)] = child
+    return pruned or None
+
+
+class Event:
+    """Mirrors firebase_admin.db.Event: event_type ("put"/"patch"), path and data"""
+
+    def __init__(self, event_type, path, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class ListenerRegistration:
+    """Delivers events to one callback on its own thread, like firebase_admin"""
+
+    def __init__(self, database, keys, callback):
+        self.database = database
+        self.keys = keys
+        self.callback = callback
+        self.events = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="local-db-listener", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            try:
+                self.callback(event)
+            except Exception:
+                pass  # A failing callback must not stop the stream
+
+    def close(self):
+        self.database._remove_listener(self)
+        self.events.put(None)
+
+
+class LocalDatabase:
+    """Thread-safe in-memory Realtime Database tree with injectable latency and failures"""
+
+    def __init__(self, data=None, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None):
+        self.root = _prune(copy.deepcopy(data)) if data else None
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.calls = Counter()  # Round trips per operation, for benchmarks
+        self._push_counter = itertools.count()
+
+    @classmethod
+    def from_file(cls, path="database.json", **options):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **options)
+
+    def reference(self, path="/"):
+        return LocalReference(self, _split(path))
+
+    def round_trip(self, operation):
+        """Simulate one network round trip: count it, wait, maybe fail"""
+        self.calls[operation] += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            raise LocalDatabaseError(f"Injected failure during {operation}")
+
+    # Tree access (callers hold self.lock)
+
+    def _node(self, keys):
+        """The stored value at keys, not copied"""
+        node = self.root
+        for key in keys:
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        return node
+
+    def _get(self, keys):
+        return copy.deepcopy(self._node(keys))
+
+    def peek(self, path="/"):
+        """Read a value without latency or injected failures (for checks in tests and benchmarks)"""
+        with self.lock:
+            return self._get(_split(path))
+
+    def _set(self, keys, value):
+        value = _prune(copy.deepcopy(value))
+        if not keys:
+            self.root = value
+            return
+        parents = [self.root if isinstance(self.root, dict) else {}]
+        for key in keys[:-1]:
+            child = parents[-1].get(key)
+            parents.append(child if isinstance(child, dict) else {})
+        if value is None:
+            parents[-1].pop(keys[-1], None)
+        else:
+            parents[-1][keys[-1]] = value
+        # Re-link the path from the bottom up, dropping parents left empty
+        node = parents[-1] or None
+        for key, parent in zip(reversed(keys[:-1]), reversed(parents[:-1])):
+            if node is None:
+                parent.pop(key, None)
+            else:
+                parent[key] = node
+            node = parent or None
+        self.root = node
+
+    def _push_key(self):
+        # Chronological like Firebase push ids: time first, then a tie-breaking counter
+        return f"-{time.time_ns():016x}{next(self._push_counter) % 0x10000:04x}"
+
+    # Listeners
+
+    def _add_listener(self, keys, callback):
+        with self.lock:
+            registration = ListenerRegistration(self, keys, callback)
+            # The first event carries the whole node, as with firebase_admin
+            registration.events.put(Event("put", "/", self._get(keys)))
+            self.listeners.append(registration)
+        return registration
+
+    def _remove_listener(self, registration):
+        with self.lock:
+            if registration in self.listeners:
+                self.listeners.remove(registration)
+
+    def _notify(self, keys, event_type, data):
+        """Queue events for a write of data at keys (callers hold self.lock)"""
+        for registration in self.listeners:
+            watched = registration.keys
+            if keys[:len(watched)] == watched:
+                path = "/" + "/".join(keys[len(watched):])
+                registration.events.put(Event(event_type, path, copy.deepcopy(data)))
+            elif watched[:len(keys)] == keys:
+                # Write above the listener: it sees its whole node replaced
+                registration.events.put(Event("put", "/", self._get(watched)))
+
+
+class LocalReference:
+    """The firebase_admin.db.Reference calls this app uses, against a LocalDatabase"""
+
+    def __init__(self, database, keys):
+        self.database = database
+        self._keys = list(keys)
+
+    @property
+    def key(self):
+        return self._keys[-1] if self._keys else None
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._keys)
+
+    @property
+    def parent(self):
+        return LocalReference(self.database, self._keys[:-1]) if self._keys else None
+
+    def child(self, path):
+        return LocalReference(self.database, self._keys + _split(path))
+
+    def get(self):
+        self.database.round_trip("get")
+        with self.database.lock:
+            return self.database._get(self._keys)
+
+    def set(self, value):
+        self.database.round_trip("set")
+        with self.database.lock:
+            self.database._set(self._keys, value)
+            self.database._notify(self._keys, "put", _prune(value))
+
+    def update(self, value):
+        """Multi-path update: keys may be nested paths ("a/b"), None deletes"""
+        if not value:
+            raise ValueError("Value argument must be a non-empty dictionary.")
+        self.database.round_trip("update")
+        with self.database.lock:
+            for path, child in value.items():
+                self.database._set(self._keys + _split(path), child)
+            self.database._notify(self._keys, "patch", dict(value))
+
+    def push(self, value=""):
+        self.database.round_trip("push")
+        with self.database.lock:
+            ref = self.child(self.database._push_key())
+            self.database._set(ref._keys, value)
+            self.database._notify(ref._keys, "put", _prune(value))
+        return ref
+
+    def delete(self):
+        self.database.round_trip("delete")
+        with self.database.lock:
+            self.database._set(self._keys, None)
+            self.database._notify(self._keys, "put", None)
+
+    def transaction(self, transaction_update):
+        """Replace the value with transaction_update(current) atomically; returns the new value.
+
+        Works like the real client: read, compute, then a conditional write
+        that only succeeds if nobody changed the value in between, retried
+        up to TRANSACTION_RETRIES times. Each attempt costs two round trips.
+        """
+        for _ in range(TRANSACTION_RETRIES):
+            self.database.round_trip("transaction")
+            with self.database.lock:
+                current = self.database._get(self._keys)
+            new_value = transaction_update(copy.deepcopy(current))
+            self.database.round_trip("transaction")
+            with self.database.lock:
+                if self.database._get(self._keys) != current:
+                    continue  # Lost the race; run the update again on the new value
+                self.database._set(self._keys, new_value)
+                self.database._notify(self._keys, "put", _prune(new_value))
+            return new_value
+        raise TransactionAbortedError(f"Transaction at {self.path} aborted after {TRANSACTION_RETRIES} retries")
+
+    def listen(self, callback):
+        self.database.round_trip("listen")
+        return self.database._add_listener(self._keys, callback)
+
+    def order_by_child(self, path):
+        return LocalQuery(self, path)
+
+
+class LocalQuery:
+    """order_by_child() query with equal_to/start_at/end_at and limits"""
+
+    def __init__(self, reference, order_by):
+        self.reference = reference
+        self.order_by = _split(order_by)
+        self.start = self.end = None
+        self.limit = None  # ("first" | "last", n)
+
+    def equal_to(self, value):
+        self.start = self.end = value
+        return self
+
+    def start_at(self, value):
+        self.start = value
+        return self
+
+    def end_at(self, value):
+        self.end = value
+        return self
+
+    def limit_to_first(self, limit):
+        self.limit = ("first", limit)
+        return self
+
+    def limit_to_last(self, limit):
+        self.limit = ("last", limit)
+        return self
+
+    def _value(self, child):
+        for key in self.order_by:
+            child = child.get(key) if isinstance(child, dict) else None
+        return child
+
+    def get(self):
+        database = self.reference.database
+        database.round_trip("query")
+        rows = []
+        with database.lock:
+            node = database._node(self.reference._keys)
+            if not isinstance(node, dict):
+                return OrderedDict()
+            # Filter on the stored tree; only the matching children are copied
+            for key, child in node.items():
+                value = self._value(child)
+                if self.start is not None and (value is None or type(value) != type(self.start)
+                                               or value < self.start):
+                    continue
+                if self.end is not None and (value is None or type(value) != type(self.end)
+                                             or value > self.end):
+                    continue
+                rows.append((value, key, copy.deepcopy(child)))
+        rows.sort(key=lambda row: (row[0] is not None, str(type(row[0])), row[0], row[1]))
+        if self.limit is not None:
+            side, n = self.limit
+            rows = rows[:n] if side == "first" else rows[-n:]
+        return OrderedDict((key, child) for _, key, child in rows)
@@ -1,5 +1,6 @@
 import streamlit as st
-from firebase_admin import db
+
+from app_cache import get_user_directory, invalidate_user
 
 def login_page():
     st.title("🔑 Login / Sign Up")
@@ -12,16 +13,10 @@ def login_page():
     if choice == "Sign Up":
         if st.button("Create Account"):
             if email and password:
-                user_ref = db.reference("/users")
-                existing = user_ref.order_by_child("email").equal_to(email).get()
-
-                if existing:
+                if not get_user_directory().create(email, password):
                     st.error("⚠️ Email already registered")
                 else:
-                    user_ref.push({
-                        "email": email,
-                        "password": password  # ⚠️ Plain text, production me hashing karo!
-                    })
+                    invalidate_user(email)  # Forget a cached "no such user"
                     st.success("✅ Account created successfully!")
             else:
                 st.warning("Please fill all fields")
@@ -29,17 +24,13 @@ def login_page():
     elif choice == "Login":
         if st.button("Login"):
             if email and password:
-                user_ref = db.reference("/users")
-                users = user_ref.order_by_child("email").equal_to(email).get()
-
-                if users:
-                    for _, user in users.items():
-                        if user["password"] == password:
-                            st.session_state["logged_in"] = True
-                            st.session_state["user_email"] = email
-                            st.success("✅ Login successful!")
-                            st.rerun()
-                        else:
-                            st.error("❌ Wrong password")
+                # One indexed query returns the login check and the role together
+                user, error = get_user_directory().authenticate(email, password)
+                if user:
+                    st.session_state["logged_in"] = True
+                    st.session_state["user_email"] = user["email"]
+                    st.session_state["role"] = user["role"]
+                    st.success("✅ Login successful!")
+                    st.rerun()
                 else:
-                    st.error("❌ No account found with this email")
+                    st.error(error)
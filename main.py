@@ -1,32 +1,99 @@
 import cv2
-import pickle
 import numpy as np
 import os
 import time
+import math
+import argparse
+from dataclasses import dataclass
+
+from slot_scoring import (score_slots, available_mask, downsample, scaled_slot_boxes,
+                          slot_motion)
+from slot_regions import processing_regions, threshold_regions
+from slot_overlay import SlotOverlay
+from slot_geometry import SlotPolygons, polygon_bounds
+from layout_format import positions, read_polygons
+from position_store import load_layout
+from frame_pipeline import FramePipeline
+from detector_metrics import DetectorMetrics, JsonlDumper, start_metrics_server
+
+
+@dataclass
+class DetectionParams:
+    """Preprocessing parameters (same meaning as the Controls trackbars)"""
+    threshold: int = 25
+    block_size: int = 11
+    c_value: int = 2
+    blur: int = 3
+
 
 class CarParkingDetector:
-    def __init__(self, video_path='carPark.mp4'):
-        self.cap = cv2.VideoCapture(video_path)
-        if not self.cap.isOpened():
-            print(f"Error: Could not open video file {video_path}")
-            return
+    def __init__(self, video_path='carPark.mp4', headless=False, params=None,
+                 positions_path='CarParkPos', polygons_path=None):
+        self.headless = headless
+        self.params = params if params is not None else DetectionParams()
+        self.positions_path = positions_path
+        self.polygons_path = polygons_path
             
+        # Optional polygonal slots (angled cameras); rasterised once per frame size
+        self.polygons = None
+        self.slot_geometry = None
+
         self.width, self.height = 103, 43
+        # Per-slot (w, h) arrays when the layout mixes slot sizes; width/height are then the largest
+        self.slot_sizes = None
+        self.outlines = None  # Rectangle outlines the overlay draws for mixed sizes
         self.posList = []
         self.load_parking_positions()
+        if polygons_path:
+            self.load_parking_polygons()
         
         # Performance variables
         self.frame_count = 0
         self.warmup_frames = 30
         self.debounce_frames = 10  # Increased debounce for stability
-        self.slot_state = [0] * len(self.posList)
-        self.slot_debounce = [0] * len(self.posList)
         
         # Stability improvements
-        self.slot_history = [[] for _ in range(len(self.posList))]  # Store last N measurements
         self.history_length = 5  # Number of frames to average
         self.stability_threshold = 0.7  # 70% of frames must agree
+
+        # Per-slot state arrays (allocated by reset_slot_state)
+        self.reset_slot_state()
+
+        # Incremental mode: only re-score slots whose pixels changed
+        self.incremental = False
+        self.motion_threshold = 3.0  # Mean abs gray difference that marks a slot as changed
+        self.motion_scale = 4  # Downsample factor for the change signal
+        self.full_refresh_interval = 300  # Frames between forced full re-evaluations
+        self.motion_reference = None
+        self.last_full_refresh = 0
+        self.skipped_fraction = 0.0
+
+        # Frame stride: only every frame_stride-th frame is decoded and analysed,
+        # the ones in between are grab()bed (demuxed, never decoded)
+        self.frame_stride = 1
+        self.base_stride = 1
+        self.stride_timing = None  # (warmup, debounce, history) at stride 1
+        self.adaptive_stride = False
+        self.adaptive_motion_threshold = 6.0  # Mean abs gray change that switches to full rate
+        self.adaptive_hold_frames = 50  # Analysed frames to stay at full rate after motion
+        self.adaptive_hold = 0
+        self.stride_reference = None
+
+        # Preprocess only the strips covering the slots (identical output there)
+        self.restrict_to_slots = True
+        self.region_cache_key = None
+        self.regions = None
         
+        # Cached overlay layer; overlay_fps None = refresh every frame, 0 = never draw
+        self.overlay = SlotOverlay()
+        self.overlay_fps = None
+
+        # Per-stage timings, always on (see detector_metrics.py)
+        self.metrics = DetectorMetrics()
+
+        # Optional SlotPublisher that receives the debounced states after each analysed frame
+        self.publisher = None
+
         # Terminal display control
         self.last_terminal_update = 0
         self.terminal_update_interval = 30  # Update terminal every 30 frames
@@ -35,37 +102,186 @@ class CarParkingDetector:
         self.show_stats = False
         self.show_list = False
         self.debug_mode = False  # Toggle debug info
+
+        # Opened last, so a detector whose source fails is still fully set up for process(frame);
+        # video_path=None gives a process-only detector with a closed capture
+        self.cap = cv2.VideoCapture(video_path) if video_path is not None else cv2.VideoCapture()
+        if video_path is not None and not self.cap.isOpened():
+            print(f"Error: Could not open video file {video_path}")
         
-        self.create_control_window()
+        # Headless mode never touches HighGUI (no display on servers)
+        if not self.headless:
+            self.create_control_window()
         
     def load_parking_positions(self):
         try:
-            with open('CarParkPos', 'rb') as f:
-                self.posList = pickle.load(f)
-            print(f"Loaded {len(self.posList)} parking positions")
+            layout = load_layout(self.positions_path)
         except:
             print("No existing parking positions found. Run ParkingSpacePicker.py first.")
             self.posList = []
+            return
+        self.posList = positions(layout)
+        print(f"Loaded {len(self.posList)} parking positions")
+        if len(layout) == 0:
+            return
+        widths, heights = layout['w'].astype(np.int64), layout['h'].astype(np.int64)
+        if (widths == widths[0]).all() and (heights == heights[0]).all():
+            self.width, self.height = int(widths[0]), int(heights[0])
+        else:
+            # Mixed slot sizes: the integral-image scoring takes per-slot widths and heights
+            self.slot_sizes = (widths, heights)
+            self.width, self.height = int(widths.max()), int(heights.max())
+            x, y = layout['x'].astype(np.int64), layout['y'].astype(np.int64)
+            corners = np.stack([np.stack([x, y], 1), np.stack([x + widths, y], 1),
+                                np.stack([x + widths, y + heights], 1), np.stack([x, y + heights], 1)], 1)
+            self.outlines = list(corners)
+
+    def load_parking_polygons(self):
+        """Load slot polygons (frame coordinates) saved by ParkingSpacePicker.
+
+        posList becomes the polygons' bounding-box corners and width/height
+        the largest box, so region, motion and overlay code keep working on
+        boxes that cover every polygon; scoring uses the exact polygon pixels.
+        """
+        try:
+            polygons = read_polygons(self.polygons_path)
+        except:
+            print(f"No parking polygons found in {self.polygons_path}, using rectangles.")
+            return
+        self.use_polygons(polygons)
+        print(f"Loaded {len(polygons)} parking polygons")
+
+    def use_polygons(self, polygons):
+        """Score slots as polygons; posList/width/height become boxes covering them"""
+        x0, y0, x1, y1 = polygon_bounds(polygons)
+        self.polygons = polygons
+        self.slot_sizes = self.outlines = None
+        self.posList = list(zip(x0.tolist(), y0.tolist()))
+        if polygons:
+            self.width, self.height = int((x1 - x0).max()), int((y1 - y0).max())
+        self.slot_geometry = None
+
+    def slot_extent(self):
+        """(width, height) for the slot-box helpers: scalars, or per-slot arrays for mixed sizes"""
+        return self.slot_sizes if self.slot_sizes is not None else (self.width, self.height)
+
+    def slot_polygons(self, frame_shape):
+        """SlotPolygons for the current polygons, rebuilt only when the frame size changes"""
+        if self.slot_geometry is None or self.slot_geometry.frame_shape != tuple(frame_shape[:2]):
+            self.slot_geometry = SlotPolygons(self.polygons, frame_shape)
+        return self.slot_geometry
+
+    def set_analysis_rate(self, stride=1, analysis_fps=None, adaptive=False):
+        """Analyse every stride-th frame (or about analysis_fps frames per second).
+
+        warmup_frames, debounce_frames and history_length are counted in
+        analysed frames, so they are rescaled to keep the wall-clock time they
+        had at stride 1. With adaptive=True the detector drops back to every
+        frame while slots are changing and returns to the stride once the lot
+        has been still for adaptive_hold_frames.
+        """
+        source_fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        if analysis_fps:
+            stride = round(source_fps / analysis_fps)
+        stride = max(1, int(stride))
+
+        if self.stride_timing is None:
+            self.stride_timing = (self.warmup_frames, self.debounce_frames, self.history_length)
+        warmup, debounce, history = self.stride_timing
+
+        self.base_stride = self.frame_stride = stride
+        self.adaptive_stride = adaptive and stride > 1
+        self.adaptive_hold = 0
+        self.adaptive_hold_frames = int(2 * source_fps)  # About two seconds at full rate
+        self.warmup_frames = math.ceil(warmup / stride)
+        self.history_length = max(1, round(history / stride))
+        self.debounce_frames = max(1, round(debounce / stride))
+        return stride
+
+    def read_frame(self):
+        """Skip frame_stride - 1 frames with grab() and decode the next one"""
+        for _ in range(self.frame_stride - 1):
+            if not self.cap.grab():
+                return False, None
+        return self.cap.read()
+
+    def adapt_stride(self, gray):
+        """Switch between full rate and base_stride depending on slot motion"""
+        small = downsample(gray, self.motion_scale)
+        reference, self.stride_reference = self.stride_reference, small
+        if reference is None or reference.shape != small.shape or not self.posList:
+            return
+
+        boxes = scaled_slot_boxes(self.posList, *self.slot_extent(), self.motion_scale, small.shape)
+        moving = bool(np.any(slot_motion(small, reference, boxes) > self.adaptive_motion_threshold))
+        if moving:
+            self.adaptive_hold = self.adaptive_hold_frames
+            stride = 1
+        elif self.adaptive_hold > 0:
+            self.adaptive_hold -= 1
+            stride = 1
+        else:
+            stride = self.base_stride
+
+        if stride != self.frame_stride:
+            # Debounce keeps its wall-clock length; history stays sized for the base stride
+            self.frame_stride = stride
+            self.debounce_frames = max(1, round(self.stride_timing[1] / stride))
+
+    def reset_slot_state(self):
+        """Allocate per-slot state as compact arrays sized for posList and history_length"""
+        n = len(self.posList)
+        self.slot_state = np.zeros(n, dtype=np.uint8)  # 1 = Available, 0 = Occupied
+        self.slot_debounce = np.zeros(n, dtype=np.int32)
+
+        # Ring buffer of the last history_length measurements per slot
+        self.slot_history = np.zeros((n, self.history_length), dtype=np.uint8)
+        self.history_count = np.zeros(n, dtype=np.int32)  # Valid entries per row
+        self.history_pos = np.zeros(n, dtype=np.int32)  # Next write column per row
+
+        # Settled slots have a full, unanimous history and no pending change
+        self.slot_settled = np.zeros(n, dtype=bool)
+
+        # Latest metrics per slot (rows: occupancy, variance, edge density)
+        self.slot_metrics = np.full((3, n), np.nan)
 
     def create_control_window(self):
         cv2.namedWindow("Controls")
         cv2.resizeWindow("Controls", 640, 300)
-        cv2.createTrackbar("Threshold", "Controls", 25, 100, self.empty)
-        cv2.createTrackbar("Block Size", "Controls", 11, 50, self.empty)
-        cv2.createTrackbar("C Value", "Controls", 2, 20, self.empty)
-        cv2.createTrackbar("Blur", "Controls", 3, 20, self.empty)
+        # Start from the configured parameters (--threshold etc.) rather than the defaults
+        cv2.createTrackbar("Threshold", "Controls", self.params.threshold, 100, self.empty)
+        cv2.createTrackbar("Block Size", "Controls", self.params.block_size, 50, self.empty)
+        cv2.createTrackbar("C Value", "Controls", self.params.c_value, 20, self.empty)
+        cv2.createTrackbar("Blur", "Controls", self.params.blur, 20, self.empty)
 
     def empty(self, a): pass
 
-    def preprocess_image(self, img):
-        threshold = cv2.getTrackbarPos("Threshold", "Controls")
-        block_size = cv2.getTrackbarPos("Block Size", "Controls")
-        c_value = cv2.getTrackbarPos("C Value", "Controls")
-        blur_size = cv2.getTrackbarPos("Blur", "Controls")
+    def get_params(self):
+        """Current preprocessing parameters (trackbars in GUI mode)"""
+        if self.headless:
+            return self.params
+        return DetectionParams(
+            threshold=cv2.getTrackbarPos("Threshold", "Controls"),
+            block_size=cv2.getTrackbarPos("Block Size", "Controls"),
+            c_value=cv2.getTrackbarPos("C Value", "Controls"),
+            blur=cv2.getTrackbarPos("Blur", "Controls"),
+        )
+
+    def preprocess_image(self, img, params=None):
+        if params is None:
+            params = self.get_params()
+        block_size = params.block_size
+        c_value = params.c_value
+        blur_size = params.blur
 
         if block_size % 2 == 0: block_size += 1
         if blur_size % 2 == 0: blur_size += 1
 
+        if self.restrict_to_slots:
+            regions = self.processing_regions(img.shape)
+            if regions is not None:
+                return threshold_regions(img, regions, block_size, c_value, blur_size)
+
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         if blur_size > 1:
             gray = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
@@ -77,96 +293,171 @@ class CarParkingDetector:
 
         return thresh
 
-    def detect_parking_spaces_fast(self, img, img_thresh):
+    def processing_regions(self, frame_shape):
+        """Strips covering all slots, recomputed whenever posList or the frame size changes"""
+        key = (frame_shape[:2], np.asarray(self.slot_extent()).tobytes(),
+               np.asarray(self.posList, dtype=np.int64).tobytes())
+        if key != self.region_cache_key:
+            self.regions = processing_regions(self.posList, *self.slot_extent(), frame_shape)
+            self.region_cache_key = key
+        return self.regions
+
+    def update_slot_states(self, img, img_thresh):
+        """Score all slots and advance history/debounce; no drawing.
+
+        Returns (available_count, metrics) where metrics is the
+        (occupancy, variance, edge_density) tuple, or None during warmup.
+        """
         self.frame_count += 1
 
         if self.frame_count <= self.warmup_frames:
-            for pos in self.posList:
-                x, y = pos
-                w, h = self.width, self.height
-                cv2.rectangle(img, pos, (x + w, y + h), (0, 0, 255), 2)
-            return img, 0
+            return 0, None
 
-        available_count = 0
+        if self.slot_history.shape != (len(self.posList), self.history_length):
+            self.reset_slot_state()
 
-        for i, pos in enumerate(self.posList):
-            x, y = pos
-            w, h = self.width, self.height
-
-            space_crop = img_thresh[y:y+h, x:x+w]
-            space_orig = img[y:y+h, x:x+w]
-
-            # More stable occupancy metrics
-            occupancy_ratio = np.mean(space_crop > 0)
-            
-            # Use grayscale variance instead of color variance (more stable)
-            gray_space = cv2.cvtColor(space_orig, cv2.COLOR_BGR2GRAY)
-            gray_variance = np.var(gray_space)
-            
-            # Simplified edge detection with lower sensitivity
-            edges = cv2.Canny(gray_space, 30, 100)  # Lower thresholds
-            edge_density = np.mean(edges > 0)
-
-            # Store measurement in history
-            if len(self.slot_history[i]) >= self.history_length:
-                self.slot_history[i].pop(0)
-            
-            # Determine current state with more lenient thresholds
-            if occupancy_ratio < 0.5 and edge_density < 0.1 and gray_variance < 800:
-                current_state = 1  # Available
-            else:
-                current_state = 0  # Occupied
-            
-            self.slot_history[i].append(current_state)
-            
-            # Use majority voting from history for stability
-            if len(self.slot_history[i]) >= 3:
-                avg_state = np.mean(self.slot_history[i])
-                if avg_state >= self.stability_threshold:
-                    stable_state = 1  # Available
-                elif avg_state <= (1 - self.stability_threshold):
-                    stable_state = 0  # Occupied
-                else:
-                    stable_state = self.slot_state[i]  # Keep previous state
-            else:
-                stable_state = current_state
-
-            # Debounce logic with stable state
-            if stable_state != self.slot_state[i]:
-                self.slot_debounce[i] += 1
-                if self.slot_debounce[i] >= self.debounce_frames:
-                    self.slot_state[i] = stable_state
-                    self.slot_debounce[i] = 0
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if self.incremental:
+            indices = self.select_changed_slots(gray)
+        else:
+            indices = np.arange(len(self.posList))
+        self.skipped_fraction = 1 - len(indices) / len(self.posList) if self.posList else 0.0
+
+        # Score the selected slots at once, then apply the thresholds as one mask
+        if self.polygons is not None:
+            occupancy, variance, edge_density = self.slot_polygons(img.shape).score(
+                img_thresh, gray, indices=indices if self.incremental else None
+            )
+        else:
+            occupancy, variance, edge_density = score_slots(
+                img, img_thresh, self.posList, *self.slot_extent(), gray=gray, indices=indices
+            )
+        current_states = available_mask(occupancy, variance, edge_density)
+        self.slot_metrics[:, indices] = (occupancy, variance, edge_density)
+
+        self.update_history(indices, current_states.astype(np.uint8))
+
+        if self.adaptive_stride:
+            self.adapt_stride(gray)
+
+        if self.publisher is not None:
+            self.publisher.observe(self.slot_state)
+
+        available_count = int(np.count_nonzero(self.slot_state))
+        return available_count, self.slot_metrics
+
+    def update_history(self, indices, current_states):
+        """Push one measurement per slot and apply majority vote, hysteresis and debounce.
+
+        All slots in indices are updated together with array operations;
+        slots not listed keep their history, state and debounce counter.
+        """
+        length = self.history_length
+
+        # Store measurement in the ring buffer
+        write_pos = self.history_pos[indices]
+        self.slot_history[indices, write_pos] = current_states
+        self.history_pos[indices] = (write_pos + 1) % length
+        count = np.minimum(self.history_count[indices] + 1, length)
+        self.history_count[indices] = count
+
+        # Majority vote with hysteresis; unwritten ring entries are zero
+        history = self.slot_history[indices]
+        avg_state = history.sum(axis=1) / count
+        previous = self.slot_state[indices]
+        stable = np.where(avg_state >= self.stability_threshold, 1,
+                          np.where(avg_state <= (1 - self.stability_threshold), 0, previous))
+        stable = np.where(count >= 3, stable, current_states).astype(np.uint8)
+
+        # Debounce: a new stable state must hold for debounce_frames measurements
+        debounce = np.where(stable != previous, self.slot_debounce[indices] + 1, 0)
+        flip = debounce >= self.debounce_frames
+        state = np.where(flip, stable, previous).astype(np.uint8)
+        debounce[flip] = 0
+
+        self.slot_state[indices] = state
+        self.slot_debounce[indices] = debounce
+        self.slot_settled[indices] = ((debounce == 0) & (count == length) &
+                                      (history == state[:, None]).all(axis=1))
+
+    def select_changed_slots(self, gray):
+        """Indices of slots to re-score this frame in incremental mode.
+
+        A slot is re-scored when its downsampled pixels moved away from the
+        frame it was last scored on, or while its history/debounce is still
+        settling. Every full_refresh_interval frames all slots are re-scored.
+        """
+        small = downsample(gray, self.motion_scale)
+        n = len(self.posList)
+
+        if (self.motion_reference is None or self.motion_reference.shape != small.shape or
+                self.frame_count - self.last_full_refresh >= self.full_refresh_interval):
+            self.motion_reference = small
+            self.last_full_refresh = self.frame_count
+            return np.arange(n)
+
+        boxes = scaled_slot_boxes(self.posList, *self.slot_extent(), self.motion_scale, small.shape)
+        change = slot_motion(small, self.motion_reference, boxes)
+        indices = np.flatnonzero((change > self.motion_threshold) | ~self.slot_settled)
+
+        # The reference only advances where a slot is actually re-scored
+        x0, y0, x1, y1 = boxes
+        for i in indices:
+            self.motion_reference[y0[i]:y1[i], x0[i]:x1[i]] = small[y0[i]:y1[i], x0[i]:x1[i]]
+        return indices
+
+
+    def draw_parking_spaces(self, img, available_count, metrics, slot_state=None):
+        """Blend the cached slot/counter overlay onto img (debug text is drawn directly)"""
+        if self.overlay_fps == 0:
+            return img
+        if slot_state is None:
+            slot_state = self.slot_state
+
+        # Refresh the layer at most overlay_fps times per second; blend every frame
+        refresh_interval = 1.0 / self.overlay_fps if self.overlay_fps else 0.0
+        outlines = self.polygons if self.polygons is not None else self.outlines
+        if (self.overlay.layer is None or
+                time.perf_counter() - self.overlay.updated >= refresh_interval):
+            if metrics is None:
+                # Warmup: everything drawn as occupied, no counters yet
+                self.overlay.update(img.shape, self.posList, self.width, self.height,
+                                    np.zeros(len(self.posList), dtype=np.uint8),
+                                    polygons=outlines)
             else:
-                self.slot_debounce[i] = 0
-
-            if self.slot_state[i] == 1:
-                available_count += 1
-
-            color = (0, 255, 0) if self.slot_state[i] == 1 else (0, 0, 255)
-            cv2.rectangle(img, pos, (x+w, y+h), color, 2)
-            
-            # Debug info overlay
-            if self.debug_mode:
-                debug_text = f"O:{occupancy_ratio:.2f} E:{edge_density:.2f} V:{gray_variance:.0f}"
+                self.overlay.update(img.shape, self.posList, self.width, self.height,
+                                    slot_state, available_count, polygons=outlines)
+        self.overlay.blend(img)
+
+        # Debug info overlay
+        if self.debug_mode and metrics is not None:
+            occupancy, variance, edge_density = metrics
+            for i, (x, y) in enumerate(self.posList):
+                debug_text = f"O:{occupancy[i]:.2f} E:{edge_density[i]:.2f} V:{variance[i]:.0f}"
                 cv2.putText(img, debug_text, (x, y-5), cv2.FONT_HERSHEY_SIMPLEX, 0.3, (255, 255, 255), 1)
 
-        # Add count display on screen
-        total_slots = len(self.posList)
-        occupied_slots = total_slots - available_count
-        
-        # Large count display at top-left
-        cv2.putText(img, f"AVAILABLE: {available_count}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
-        cv2.putText(img, f"OCCUPIED: {occupied_slots}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
-        cv2.putText(img, f"TOTAL: {total_slots}", (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3)
-        
-        # Add percentage
-        if total_slots > 0:
-            utilization = (occupied_slots / total_slots) * 100
-            cv2.putText(img, f"UTILIZATION: {utilization:.1f}%", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 0), 2)
+        return img
 
+    def detect_parking_spaces_fast(self, img, img_thresh):
+        available_count, metrics = self.update_slot_states(img, img_thresh)
+        img = self.draw_parking_spaces(img, available_count, metrics)
         return img, available_count
 
+    def process(self, frame):
+        """Headless entry point: analyse one BGR frame and return slot states.
+
+        Returns a uint8 array with 1 (available) or 0 (occupied) per slot in posList.
+        Nothing is drawn on the frame.
+        """
+        t0 = time.perf_counter()
+        img_thresh = self.preprocess_image(frame)
+        t1 = time.perf_counter()
+        self.update_slot_states(frame, img_thresh)
+        t2 = time.perf_counter()
+        self.metrics.record("preprocess", t1 - t0)
+        self.metrics.record("score", t2 - t1)
+        return self.slot_state.copy()
+
     def update_terminal_display(self, available_spaces):
         """Update terminal with real-time parking counts"""
         total_slots = len(self.posList)
@@ -185,6 +476,10 @@ class CarParkingDetector:
         print(f"✅ AVAILABLE:       {available_spaces:>3}")
         print(f"🚗 OCCUPIED:        {occupied_slots:>3}")
         print(f"📈 UTILIZATION:     {utilization:>6.1f}%")
+        if self.frame_stride > 1 or self.adaptive_stride:
+            print(f"🎞️  FRAME STRIDE:    {self.frame_stride:>3}")
+        if self.incremental:
+            print(f"⏭️  SKIPPED SLOTS:   {self.skipped_fraction * 100:>6.1f}%")
         print("=" * 40)
         print("Controls: 'q'=quit, 'p'=stats, 'l'=list, 'd'=debug")
         print("Press 'q' to exit")
@@ -209,19 +504,42 @@ class CarParkingDetector:
                 print(f"S{i:02d} → {status}")
             print("-" * 30)
 
+    def handle_key(self, key):
+        """Apply a keyboard command; returns False when the user quits"""
+        if key == ord('q'):
+            print("Quitting...")
+            return False
+        elif key == ord('p'):
+            self.show_stats = not self.show_stats
+            print(f"Stats display {'ON' if self.show_stats else 'OFF'}")
+        elif key == ord('l'):
+            self.show_list = not self.show_list
+            print(f"List view {'ON' if self.show_list else 'OFF'}")
+        elif key == ord('d'):
+            self.debug_mode = not self.debug_mode
+            print(f"Debug mode {'ON' if self.debug_mode else 'OFF'}")
+        return True
+
     def run(self):
         print("Starting optimized car parking detection...")
         print("Press 'q' to quit, 'p' for stats, 'l' for slot list, 'd' for debug mode")
         
+        metrics = self.metrics
         while True:
-            success, img = self.cap.read()
+            t0 = time.perf_counter()
+            success, img = self.read_frame()
+            t1 = time.perf_counter()
             if not success:
                 print("Video ended or error reading frame. Press any key to exit...")
                 cv2.waitKey(0)
                 break
 
             img_thresh = self.preprocess_image(img)
-            img, available_spaces = self.detect_parking_spaces_fast(img, img_thresh)
+            t2 = time.perf_counter()
+            available_spaces, slot_metrics = self.update_slot_states(img, img_thresh)
+            t3 = time.perf_counter()
+            img = self.draw_parking_spaces(img, available_spaces, slot_metrics)
+            t4 = time.perf_counter()
 
             # Update terminal display periodically
             if self.frame_count - self.last_terminal_update >= self.terminal_update_interval:
@@ -235,26 +553,160 @@ class CarParkingDetector:
             cv2.imshow("Threshold", img_thresh)
 
             key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                print("Quitting...")
+            t5 = time.perf_counter()
+
+            metrics.record("decode", t1 - t0)
+            metrics.record("preprocess", t2 - t1)
+            metrics.record("score", t3 - t2)
+            metrics.record("overlay", t4 - t3)
+            metrics.record("display", t5 - t4)
+            metrics.frame_done(available_spaces, len(self.posList))
+
+            if not self.handle_key(key):
                 break
-            elif key == ord('p'):
-                self.show_stats = not self.show_stats
-                print(f"Stats display {'ON' if self.show_stats else 'OFF'}")
-            elif key == ord('l'):
-                self.show_list = not self.show_list
-                print(f"List view {'ON' if self.show_list else 'OFF'}")
-            elif key == ord('d'):
-                self.debug_mode = not self.debug_mode
-                print(f"Debug mode {'ON' if self.debug_mode else 'OFF'}")
 
         self.cap.release()
         cv2.destroyAllWindows()
         print("Program ended.")
 
+    def run_headless(self, report_fps=False):
+        """Process the stream as fast as decode allows, without any windows"""
+        print("Starting headless car parking detection...")
+        start = time.perf_counter()
+        window_start, window_frames = start, 0
+        skipped_total = 0.0
+        available_spaces = 0
+
+        while True:
+            t0 = time.perf_counter()
+            success, img = self.read_frame()
+            if not success:
+                break
+            self.metrics.record("decode", time.perf_counter() - t0)
+
+            states = self.process(img)
+            available_spaces = int(np.count_nonzero(states))
+            self.metrics.frame_done(available_spaces, len(self.posList))
+            window_frames += 1
+            skipped_total += self.skipped_fraction
+
+            if self.frame_count - self.last_terminal_update >= self.terminal_update_interval:
+                if report_fps:
+                    now = time.perf_counter()
+                    fps = window_frames / (now - window_start) if now > window_start else 0.0
+                    skipped = f", {self.skipped_fraction * 100:.0f}% slots skipped" if self.incremental else ""
+                    print(f"Frame {self.frame_count}: {fps:.1f} fps, "
+                          f"{available_spaces}/{len(self.posList)} available{skipped}")
+                    window_start, window_frames = now, 0
+                self.last_terminal_update = self.frame_count
+
+        self.cap.release()
+        elapsed = time.perf_counter() - start
+        if report_fps and elapsed > 0:
+            print(f"Processed {self.frame_count} frames in {elapsed:.2f}s "
+                  f"({self.frame_count / elapsed:.1f} fps)")
+            if self.incremental and self.frame_count:
+                scored_frames = max(1, self.frame_count - self.warmup_frames)
+                print(f"Average skipped slots: {skipped_total / scored_frames * 100:.1f}%")
+        self.print_occupancy_demo(available_spaces)
+        return available_spaces
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Car parking space detector")
+    parser.add_argument("--video", default="carPark.mp4", help="Video file to analyse")
+    parser.add_argument("--positions", default="CarParkPos", help="Parking position file")
+    parser.add_argument("--polygons", default=None,
+                        help="Slot polygon file from ParkingSpacePicker (angled cameras)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without windows or rendering (servers without a display)")
+    parser.add_argument("--fps", action="store_true", help="Report processed frames/sec (headless mode)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Decode ahead on a capture thread and detect on a worker thread")
+    parser.add_argument("--queue-depth", type=int, default=4, help="Frames buffered between pipeline stages")
+    parser.add_argument("--drop-policy", choices=["oldest", "block"], default=None,
+                        help="Full queue behaviour: drop the oldest frame or wait "
+                             "(default: wait for video files, drop for live streams)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-score slots whose pixels changed since they were last scored")
+    parser.add_argument("--motion-threshold", type=float, default=3.0,
+                        help="Mean abs gray difference that marks a slot as changed (incremental mode)")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="Analyse every k-th frame; frames in between are skipped without decoding")
+    parser.add_argument("--analysis-fps", type=float, default=None,
+                        help="Target analysed frames per second (overrides --stride)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Analyse every frame while slots are changing, the stride otherwise")
+    parser.add_argument("--overlay-fps", type=float, default=None,
+                        help="Overlay refresh rate (default every frame, 0 = never draw the overlay)")
+    parser.add_argument("--full-frame", action="store_true",
+                        help="Preprocess the whole frame instead of only the slot regions")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this local port")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="Metrics server bind address")
+    parser.add_argument("--metrics-jsonl", default=None, help="Append metrics snapshots to this JSON-lines file")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="Seconds between JSON-lines snapshots")
+    parser.add_argument("--publish", default=None,
+                        help="Database path to publish slot state changes to (e.g. parking/zone1-main)")
+    parser.add_argument("--publish-window", type=float, default=2.0,
+                        help="Seconds slot changes are collected into one database update")
+    parser.add_argument("--threshold", type=int, default=25)
+    parser.add_argument("--block-size", type=int, default=11)
+    parser.add_argument("--c-value", type=int, default=2)
+    parser.add_argument("--blur", type=int, default=3)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    if not os.path.exists("carPark.mp4"):
-        print("Error: carPark.mp4 not found!")
+    args = parse_args()
+    if not os.path.exists(args.video):
+        print(f"Error: {args.video} not found!")
     else:
-        detector = CarParkingDetector(video_path="carPark.mp4")
-        detector.run()
+        params = DetectionParams(args.threshold, args.block_size, args.c_value, args.blur)
+        detector = CarParkingDetector(video_path=args.video, headless=args.headless, params=params,
+                                      positions_path=args.positions, polygons_path=args.polygons)
+        detector.incremental = args.incremental
+        detector.restrict_to_slots = not args.full_frame
+        detector.motion_threshold = args.motion_threshold
+        detector.overlay_fps = args.overlay_fps
+        if args.stride > 1 or args.analysis_fps:
+            stride = detector.set_analysis_rate(args.stride, args.analysis_fps, args.adaptive)
+            print(f"Analysing every {stride} frame(s){' (adaptive)' if detector.adaptive_stride else ''}")
+
+        if args.metrics_port is not None:
+            start_metrics_server(detector.metrics, args.metrics_port, args.metrics_host)
+        writes = None
+        if args.publish:
+            # Database modules are only needed when publishing
+            import storage
+            from slot_publisher import SlotPublisher
+            from write_queue import WriteBehindQueue
+            writes = WriteBehindQueue(storage.reference("/")).start()
+            detector.publisher = SlotPublisher(writes, args.publish, window=args.publish_window)
+
+        dumper = None
+        if args.metrics_jsonl:
+            dumper = JsonlDumper(detector.metrics, args.metrics_jsonl, args.metrics_interval).start()
+
+        if args.pipeline:
+            drop_policy = args.drop_policy
+            if drop_policy is None:
+                # Files report a frame count; dropping there would just skip footage
+                drop_policy = "block" if detector.cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0 else "oldest"
+            pipeline = FramePipeline(detector, queue_depth=args.queue_depth,
+                                     drop_oldest=drop_policy == "oldest",
+                                     render=not args.headless)
+            pipeline.run(report_fps=args.fps)
+        elif args.headless:
+            detector.run_headless(report_fps=args.fps)
+        else:
+            detector.run()
+
+        if dumper is not None:
+            dumper.stop()
+        if writes is not None:
+            detector.publisher.flush()
+            writes.stop()
+            print(f"Published {detector.publisher.updates} updates "
+                  f"({detector.publisher.slots_sent} slot values) to /{detector.publisher.path}")
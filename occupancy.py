@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import os
+
+from slot_scoring import score_slots, available_mask
+from position_store import load_positions
+
+
+def _load_positions(positions_candidates=("CarParkPos", "CarParkPos.unknown")):
+    for path in positions_candidates:
+        try:
+            return load_positions(path)
+        except Exception:
+            continue
+    return []
+
+
+def _available_slots(img, pos_list):
+    """Availability decision for every slot on one frame (fixed params, no trackbars)"""
+    block_size = 11
+    c_value = 2
+    blur_size = 3
+    width, height = 103, 43
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if blur_size % 2 == 0:
+        blur_size += 1
+    gray = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
+    if block_size % 2 == 0:
+        block_size += 1
+    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                   cv2.THRESH_BINARY_INV, block_size, c_value)
+
+    occupancy, variance, edge_density = score_slots(img, thresh, pos_list, width, height)
+    return available_mask(occupancy, variance, edge_density)
+
+
+def compute_available_from_video(video_path="carPark.mp4",
+                                 positions_candidates=("CarParkPos", "CarParkPos.unknown")):
+    """Scan the first frame of a video and return (available, total) slots"""
+    try:
+        if not os.path.exists(video_path):
+            return 0, 0
+        pos_list = _load_positions(positions_candidates)
+        cap = cv2.VideoCapture(video_path)
+        success, img = cap.read()
+        cap.release()
+        if not success or img is None or len(pos_list) == 0:
+            return 0, len(pos_list)
+
+        available_count = int(np.count_nonzero(_available_slots(img, pos_list)))
+        return available_count, len(pos_list)
+    except Exception:
+        return 0, 0
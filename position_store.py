@@ -0,0 +1,157 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from layout_format import (DEFAULT_HEIGHT, DEFAULT_WIDTH, LAYOUT_DTYPE, atomic_write, layout_bytes,
+                           make_layout, positions, read_snapshot)
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def journal_path(path):
+    return path + JOURNAL_SUFFIX
+
+
+def apply_edit(records, edit):
+    """Apply one journal edit to a list of layout records (x, y, w, h, zone, camera) in place"""
+    op = edit["op"]
+    if op == "add":
+        x, y = edit["pos"]
+        w, h = edit.get("size", (DEFAULT_WIDTH, DEFAULT_HEIGHT))
+        records.append((x, y, w, h, edit.get("zone", 0), edit.get("camera", 0)))
+    elif op == "remove":
+        del records[edit["index"]]
+    elif op == "clear":
+        records.clear()
+
+
+def read_journal(path):
+    """Edits recorded in a journal; a torn last line (writer mid-append) is ignored"""
+    edits = []
+    try:
+        with open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+    except FileNotFoundError:
+        return edits
+    # Everything after the last newline is an incomplete append
+    for line in lines[:-1]:
+        if line.strip():
+            edits.append(json.loads(line))
+    return edits
+
+
+def current_snapshot(path):
+    """Snapshot id of the layout file at path (0 when there is none yet)"""
+    try:
+        return read_snapshot(path)[1]
+    except FileNotFoundError:
+        return 0
+
+
+def load_layout(path):
+    """The slot layout at path (layout file or legacy pickle) with its edit journal replayed.
+
+    This is the one loader behind the detector, the picker and the
+    occupancy sync. Only journal edits tagged with the snapshot's id are
+    replayed; lines left over from before a compaction are skipped. Without
+    pending edits a layout file comes back memory-mapped. Raises
+    FileNotFoundError when neither file exists.
+    """
+    journal = journal_path(path)
+    if os.path.exists(path):
+        layout, snapshot = read_snapshot(path)
+    elif os.path.exists(journal):
+        layout, snapshot = np.zeros(0, dtype=LAYOUT_DTYPE), 0
+    else:
+        raise FileNotFoundError(path)
+
+    edits = [edit for edit in read_journal(journal) if edit.get("snapshot", 0) == snapshot]
+    if not edits:
+        return layout
+    records = layout.tolist()
+    for edit in edits:
+        apply_edit(records, edit)
+    return np.array(records, dtype=LAYOUT_DTYPE)
+
+
+def load_positions(path):
+    """(x, y) slot positions from load_layout(path)"""
+    return positions(load_layout(path))
+
+
+class PositionJournal:
+    """Coalesced, crash-safe persistence for an editable slot list.
+
+    Edits are buffered and appended to an append-only journal once no new
+    edit has arrived for coalesce_window seconds, so a burst of clicks costs
+    one small write. Every journal line carries the id of the snapshot it
+    applies to. compact() renames a new snapshot with a fresh id into place
+    and only then empties the journal, so a crash or a reader in between
+    sees the new snapshot and skips the old edits; readers going through
+    load_layout() never see a torn, stale or half-applied layout.
+    """
+
+    def __init__(self, path, coalesce_window=0.5, compact_every=500):
+        self.path = path
+        self.journal = journal_path(path)
+        self.coalesce_window = coalesce_window
+        self.compact_every = compact_every  # Journal entries before a full rewrite
+        self.pending = []
+        self.last_edit = 0.0
+        self.snapshot = current_snapshot(path)  # Id the journal's edits are tagged with
+        self._drop_torn_tail()
+        self.journal_entries = len(read_journal(self.journal))
+
+    def _drop_torn_tail(self):
+        """Cut an append interrupted by a crash so new edits start on a fresh line"""
+        try:
+            with open(self.journal, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    def record(self, edit):
+        self.pending.append(edit)
+        self.last_edit = time.monotonic()
+
+    @property
+    def dirty(self):
+        return bool(self.pending)
+
+    def flush(self, force=False):
+        """Append buffered edits once the burst is over; returns True when something was written"""
+        if not self.pending:
+            return False
+        if not force and time.monotonic() - self.last_edit < self.coalesce_window:
+            return False
+        data = "".join(json.dumps(dict(edit, snapshot=self.snapshot)) + "\n" for edit in self.pending).encode()
+        with open(self.journal, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_entries += len(self.pending)
+        self.pending = []
+        return True
+
+    def needs_compaction(self):
+        return self.journal_entries >= self.compact_every
+
+    def compact(self, layout):
+        """Write a layout (or a list of (x, y) positions) as the new snapshot and start an empty journal.
+
+        The snapshot goes in first under a new id; the old journal lines are
+        tagged with the previous id, so they are ignored from that moment on
+        and emptying the journal afterwards is only housekeeping.
+        """
+        if not isinstance(layout, np.ndarray):
+            layout = make_layout(layout)
+        snapshot = max(time.time_ns(), self.snapshot + 1)
+        atomic_write(self.path, layout_bytes(layout, snapshot))
+        self.snapshot = snapshot
+        atomic_write(self.journal, b"")
+        self.pending = []
+        self.journal_entries = 0
@@ -1,11 +1,15 @@
 import streamlit as st
 import re
-import pandas as pd
-from firebase_admin import db
+
+from app_cache import get_db, get_report_queue, get_reports_cache, report_rows
+from report_queue import apply_report
+from reports_cache import TABLE_COLUMNS
 
 def report_page():
     st.subheader("📝 Reports")
-    reports_ref = db.reference("/reports")
+    reports_ref = get_db().child("reports")
+    reports = get_reports_cache()
+    submissions = get_report_queue()
 
     # 🚀 Report form
     with st.form("report_form"):
@@ -26,48 +30,42 @@ def report_page():
             elif not (re.match(old_format_pattern, vehicle_number) or re.match(bharat_format_pattern, vehicle_number)):
                 st.error("❌ Invalid format. Use GJ01AB1234 or 22BH1234AA.")
             else:
-                vehicle_ref = reports_ref.child(vehicle_number)
-                current_data = vehicle_ref.get()
+                # Queued durably and applied by one transaction in the background
+                submission = submissions.submit(vehicle_number, vehicle_type)
+                # Show the expected record now; the live cache follows the real one when it lands
+                reports.put(vehicle_number, apply_report(reports.get(vehicle_number), submission))
 
-                if current_data:
-                    new_count = current_data.get("violations", 0) + 1
-                    fine = current_data.get("fine", 0)
+                st.success(f"✅ Reported: {vehicle_number} ({vehicle_type})")
 
-                    if new_count % 3 == 0:  # har 3rd violation pe ₹500 fine
-                        fine += 500
+    if len(submissions):
+        st.caption(f"⏳ {len(submissions)} report(s) waiting to be saved")
+    if submissions.error:
+        st.caption(f"⚠ {submissions.error}")
 
-                    vehicle_ref.update({
-                        "vehicle_number": vehicle_number,
-                        "type": vehicle_type,
-                        "violations": new_count,
-                        "fine": fine,
-                        "status": current_data.get("status", "unpaid")
-                    })
-                else:
-                    vehicle_ref.set({
-                        "vehicle_number": vehicle_number,
-                        "type": vehicle_type,
-                        "violations": 1,
-                        "fine": 0,
-                        "status": "unpaid"
-                    })
+    # 📋 Show table (from the live cache, one page at a time)
+    if reports.error:
+        st.caption(f"⚠ {reports.error}")
+    df = reports.frame()
+    if not df.empty:
+        search_col, status_col, sort_col, order_col = st.columns(4)
+        search = search_col.text_input("Search vehicle", key="report_search")
+        status = status_col.selectbox("Status", ["All", "unpaid", "paid"], key="report_status")
+        sort_by = sort_col.selectbox("Sort by", TABLE_COLUMNS, key="report_sort")
+        descending = order_col.checkbox("Descending", key="report_descending")
 
-                st.success(f"✅ Reported: {vehicle_number} ({vehicle_type})")
+        # Shared across sessions until the next change to /reports
+        matches = report_rows(reports.version, search, None if status == "All" else status, sort_by, descending)
 
-    # 📋 Show table
-    data = reports_ref.get()
-    if data:
-        table_data = []
-        for v, d in data.items():
-            table_data.append({
-                "Vehicle": v,
-                "Type": d.get("type", "N/A"),           # safe get
-                "Violations": d.get("violations", 0),
-                "Fine": d.get("fine", 0),
-                "Status": d.get("status", "unpaid")
-            })
-        df = pd.DataFrame(table_data)
-        st.table(df)
+        size_col, page_col = st.columns(2)
+        page_size = size_col.selectbox("Rows per page", [25, 50, 100], key="report_page_size")
+        pages = max(1, -(-len(matches) // page_size))
+        # Clamped rather than max_value, so a shrinking filter never leaves an invalid widget value
+        page = min(page_col.number_input("Page", min_value=1, value=1, key="report_page"), pages) - 1
+        start = page * page_size
+        shown = matches.iloc[start:start + page_size]
+        st.dataframe(shown, hide_index=True, width="stretch")
+        st.caption(f"Page {page + 1} of {pages}: {len(shown)} of {len(matches)} matching reports "
+                   f"({len(df)} total)")
 
     # 🚨 Clear fine
     vehicle_to_clear = st.text_input("Enter vehicle number to clear fine:")
@@ -78,8 +76,11 @@ def report_page():
         else:
             # Validate against allowed Firebase key pattern
             if re.match(r'^[A-Z0-9]+$', vehicle_to_clear):
-                if reports_ref.child(vehicle_to_clear).get():
-                    reports_ref.child(vehicle_to_clear).delete()
+                if (vehicle_to_clear in reports if reports.seeded.is_set()
+                        else reports_ref.child(vehicle_to_clear).get()):
+                    # Same queue as the reports, so one still queued cannot land after the clear
+                    submissions.clear(vehicle_to_clear)
+                    reports.put(vehicle_to_clear, None)
                     st.success(f"✅ Cleared & removed {vehicle_to_clear} from Firebase.")
                 else:
                     st.warning(f"⚠ Vehicle {vehicle_to_clear} not found in reports.")
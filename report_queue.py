@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from layout_format import atomic_write
+from position_store import read_journal
+
+FINE_EVERY = 3  # Every 3rd violation adds a fine
+FINE_AMOUNT = 500
+RECENT_REPORTS = 20  # Submission ids remembered per record, for idempotent replays
+
+
+def apply_report(current, submission):
+    """New /reports record after one more violation; the body of the report transaction.
+
+    Idempotent per submission: a record that already lists this
+    submission's id among its RECENT_REPORTS latest ones (the write landed
+    but its ack was lost) is returned unchanged. A replay that arrives after
+    more than RECENT_REPORTS other reports of the same plate counts twice.
+    """
+    if current and (submission["id"] in current.get("recent_reports", ())
+                    or current.get("last_report") == submission["id"]):
+        return current
+    report = dict(current or {})
+    violations = report.get("violations", 0) + 1
+    fine = report.get("fine", 0)
+    if violations % FINE_EVERY == 0:  # har 3rd violation pe ₹500 fine
+        fine += FINE_AMOUNT
+    report.update({
+        "vehicle_number": submission["vehicle"],
+        "type": submission["type"],
+        "violations": violations,
+        "fine": fine,
+        "status": report.get("status", "unpaid"),
+        "last_report": submission["id"],
+        "recent_reports": (list(report.get("recent_reports", ())) + [submission["id"]])[-RECENT_REPORTS:],
+    })
+    return report
+
+
+class ReportQueue:
+    """Durable local queue of report submissions, drained by server-side transactions.
+
+    submit() appends the report to a JSON-lines journal (fsynced) and
+    returns; a daemon thread applies queued reports in order, each as one
+    transaction on /reports/<vehicle> that increments violations and
+    applies the fine rule atomically, so concurrent reports of a plate are
+    never lost. clear() queues the removal of a record behind the reports
+    already waiting, so a queued report can never bring a cleared fine
+    back. Each applied report gets a "done" line; after a restart the
+    unacknowledged ones are replayed, and apply_report() skips one that
+    already landed. Failures (DB stalls, no network) are retried with
+    backoff up to max_delay; nothing is dropped.
+    """
+
+    def __init__(self, reports_ref, path="report_queue.journal", retry_delay=0.5, max_delay=30.0):
+        self.reports_ref = reports_ref
+        self.path = path
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.error = None
+        self.applied = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+
+        done = set()
+        submissions = []
+        for entry in read_journal(path):
+            if entry.get("done"):
+                done.add(entry["done"])
+            else:
+                submissions.append(entry)
+        self.queue = deque(s for s in submissions if s["id"] not in done)
+        # Start from a journal holding only what is still queued (also drops a torn tail)
+        self._rewrite()
+        self.thread = threading.Thread(target=self._run, name="report-queue", daemon=True)
+
+    def start(self):
+        if not self.thread.is_alive():
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        self.wakeup.set()
+        self.thread.join(timeout=timeout)
+
+    def __len__(self):
+        return len(self.queue)
+
+    def submit(self, vehicle, vehicle_type):
+        """Queue one violation report durably; returns the submission"""
+        submission = {"id": uuid.uuid4().hex, "vehicle": vehicle, "type": vehicle_type,
+                      "submitted": time.time()}
+        with self.lock:
+            self._append(submission)
+            self.queue.append(submission)
+        self.wakeup.set()
+        return submission
+
+    def clear(self, vehicle):
+        """Queue the removal of a vehicle's record (fine cleared), ordered after earlier reports"""
+        submission = {"id": uuid.uuid4().hex, "op": "clear", "vehicle": vehicle, "submitted": time.time()}
+        with self.lock:
+            self._append(submission)
+            self.queue.append(submission)
+        self.wakeup.set()
+        return submission
+
+    def _append(self, entry):
+        with open(self.path, "ab") as f:
+            f.write((json.dumps(entry) + "\n").encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite(self):
+        atomic_write(self.path, "".join(json.dumps(s) + "\n" for s in self.queue).encode())
+
+    def _apply(self, submission):
+        if submission.get("op") == "clear":
+            self.reports_ref.child(submission["vehicle"]).delete()
+            return
+        self.reports_ref.child(submission["vehicle"]).transaction(
+            lambda current: apply_report(current, submission))
+
+    def _run(self):
+        delay = self.retry_delay
+        while not self.stop_event.is_set():
+            if not self.queue:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            submission = self.queue[0]
+            try:
+                self._apply(submission)
+            except Exception as e:
+                self.error = f"Report for {submission['vehicle']} not applied yet: {e}"
+                self.stop_event.wait(delay)
+                delay = min(delay * 2, self.max_delay)
+                continue
+            delay = self.retry_delay
+            self.error = None
+            self.applied += 1
+            with self.lock:
+                self.queue.popleft()
+                if self.queue:
+                    self._append({"done": submission["id"]})
+                else:
+                    self._rewrite()  # Drained: start the journal over
@@ -0,0 +1,140 @@
+import threading
+
+import pandas as pd
+
+from write_queue import with_value
+
+# Table columns and the report field each one comes from
+REPORT_COLUMNS = {"Type": "type", "Violations": "violations", "Fine": "fine", "Status": "status"}
+REPORT_DEFAULTS = {"type": "N/A", "violations": 0, "fine": 0, "status": "unpaid"}
+TABLE_COLUMNS = ["Vehicle", *REPORT_COLUMNS]
+
+
+class ReportsCache:
+    """Local copy of /reports kept current by a Firebase listen() stream.
+
+    The first stream event carries the whole node (the one full download);
+    later events are small put/patch deltas applied to the local dict. The
+    table DataFrame is rebuilt only when a delta arrived since the last
+    frame() call, so Streamlit reruns read memory instead of the network.
+    """
+
+    def __init__(self, ref, seed_timeout=10.0):
+        self.ref = ref
+        self.seed_timeout = seed_timeout
+        self.reports = {}
+        self.version = 0
+        self.error = None
+        self.lock = threading.Lock()
+        self.seeded = threading.Event()
+        self.registration = None
+        self._frame = None
+        self._frame_version = -1
+
+    def start(self):
+        """Open the delta stream and wait (up to seed_timeout) for the initial snapshot"""
+        if self.registration is None:
+            try:
+                self.registration = self.ref.listen(self._on_event)
+            except Exception as e:
+                # No streaming (e.g. restricted network): fall back to one full read
+                self.error = f"Live updates unavailable: {e}"
+                self.reload()
+        self.seeded.wait(self.seed_timeout)
+        return self
+
+    def stop(self):
+        if self.registration is not None:
+            self.registration.close()
+            self.registration = None
+
+    def reload(self):
+        """Replace the cache with a full read of the node"""
+        self._apply("put", "/", self.ref.get())
+
+    def _on_event(self, event):
+        try:
+            self._apply(event.event_type, event.path, event.data)
+        except Exception as e:
+            self.error = f"Bad reports update at {event.path}: {e}"
+
+    def _apply(self, event_type, path, data):
+        keys = [k for k in path.split("/") if k]
+        with self.lock:
+            if event_type == "patch":
+                # A patch lists child paths (possibly nested, "KEY/fine") with their new values
+                for child, value in (data or {}).items():
+                    self._put(keys + [k for k in child.split("/") if k], value)
+            else:
+                self._put(keys, data)
+            self.version += 1
+        self.seeded.set()
+
+    def _put(self, keys, data):
+        """Set the value at keys below /reports; None deletes, as in the database"""
+        if not keys:
+            self.reports = dict(data or {})
+            return
+        vehicle = keys[0]
+        if len(keys) == 1:
+            report = data
+        else:
+            report = with_value(self.reports.get(vehicle), keys[1:], data)
+        if report is None or report == {}:
+            self.reports.pop(vehicle, None)
+        else:
+            self.reports[vehicle] = report
+
+    def put(self, vehicle, report):
+        """Apply a write this process just made (None deletes) ahead of its echo on the stream"""
+        self._apply("put", "/" + vehicle, report)
+
+    def __contains__(self, vehicle):
+        return vehicle in self.reports
+
+    def get(self, vehicle):
+        return self.reports.get(vehicle)
+
+    def frame(self):
+        """All reports as a DataFrame with TABLE_COLUMNS, cached until the next delta"""
+        with self.lock:
+            if self._frame_version == self.version:
+                return self._frame
+            reports = {k: v for k, v in self.reports.items() if isinstance(v, dict)}
+            version = self.version
+        self._frame = reports_frame(reports)
+        self._frame_version = version
+        return self._frame
+
+
+def reports_frame(reports):
+    """DataFrame with TABLE_COLUMNS for a {vehicle: report} dict.
+
+    Each column is pulled out in one pass and cleaned up column-wise;
+    about three times faster than DataFrame.from_dict(orient="index").
+    """
+    rows = list(reports.values())
+    data = {"Vehicle": list(reports)}
+    for column, field in REPORT_COLUMNS.items():
+        data[column] = [report.get(field) for report in rows]
+    df = pd.DataFrame(data)
+    for column, field in REPORT_COLUMNS.items():
+        default = REPORT_DEFAULTS[field]
+        if isinstance(default, int):
+            df[column] = pd.to_numeric(df[column], errors="coerce").fillna(default).astype("int64")
+        else:
+            df[column] = df[column].fillna(default)
+    return df
+
+
+def query_reports(df, search="", status=None, sort_by="Vehicle", descending=False):
+    """Rows of a reports frame matching a vehicle search and status, sorted by one column"""
+    mask = pd.Series(True, index=df.index)
+    if search:
+        mask &= df["Vehicle"].str.contains(search.strip().upper(), regex=False)
+    if status:
+        mask &= df["Status"] == status
+    matches = df[mask]
+    if sort_by in matches.columns:
+        matches = matches.sort_values(sort_by, ascending=not descending, kind="stable")
+    return matches
@@ -0,0 +1,148 @@
+import cv2
+import numpy as np
+
+from slot_scoring import CANNY_LOW, CANNY_HIGH
+
+
+def rect_polygons(pos_list, width, height):
+    """Corner polygons (tl, tr, br, bl) for axis-aligned slots.
+
+    Corners sit on the outermost pixel centres (x + width - 1), since
+    cv2.fillPoly fills the edges too; the polygon then covers exactly the
+    width x height pixels score_slots reads for the same slot.
+    """
+    pos = np.asarray(pos_list, dtype=np.float32).reshape(-1, 1, 2)
+    right, bottom = width - 1, height - 1
+    offsets = np.float32([[0, 0], [right, 0], [right, bottom], [0, bottom]])
+    return list(pos + offsets)
+
+
+def transform_polygons(polygons, matrix):
+    """Map polygon corners through a 3x3 perspective matrix (corners only, no pixels)"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return [cv2.perspectiveTransform(np.asarray(p, dtype=np.float32).reshape(-1, 1, 2), matrix).reshape(-1, 2)
+            for p in polygons]
+
+
+def polygon_bounds(polygons):
+    """(x0, y0, x1, y1) int arrays of the pixel bounding box of every polygon"""
+    if len(polygons) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty.copy(), empty.copy(), empty.copy()
+    lo = np.array([np.floor(np.min(p, axis=0)) for p in polygons], dtype=np.int64)
+    hi = np.array([np.floor(np.max(p, axis=0)) + 1 for p in polygons], dtype=np.int64)
+    return lo[:, 0], lo[:, 1], hi[:, 0], hi[:, 1]
+
+
+def segment_sums(values, counts):
+    """Sum of consecutive runs of values with the given lengths (empty runs sum to 0)"""
+    sums = np.zeros(len(counts), dtype=np.float64)
+    if len(values) == 0:
+        return sums
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    nonempty = counts > 0
+    sums[nonempty] = np.add.reduceat(values, starts[nonempty], dtype=np.float64)
+    return sums
+
+
+class PerspectiveRemap:
+    """warpPerspective as precomputed cv2.remap tables.
+
+    The inverse mapping for every output pixel is built once per matrix and
+    output size; applying it is a single table lookup per pixel instead of a
+    projective division per pixel on every frame.
+    """
+
+    def __init__(self, matrix, size):
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.size = tuple(size)  # (width, height) of the output
+        w, h = self.size
+
+        xs, ys = np.meshgrid(np.arange(w, dtype=np.float64), np.arange(h, dtype=np.float64))
+        inverse = np.linalg.inv(self.matrix)
+        src_x = inverse[0, 0] * xs + inverse[0, 1] * ys + inverse[0, 2]
+        src_y = inverse[1, 0] * xs + inverse[1, 1] * ys + inverse[1, 2]
+        src_w = inverse[2, 0] * xs + inverse[2, 1] * ys + inverse[2, 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            map_x = (src_x / src_w).astype(np.float32)
+            map_y = (src_y / src_w).astype(np.float32)
+        # Fixed-point maps are the fastest form for cv2.remap
+        self.map1, self.map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    def matches(self, matrix, size):
+        return tuple(size) == self.size and np.array_equal(np.asarray(matrix, dtype=np.float64), self.matrix)
+
+    def apply(self, img):
+        return cv2.remap(img, self.map1, self.map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+
+class SlotPolygons:
+    """Polygonal slots rasterised once for a frame size.
+
+    Every slot gets a boolean mask over its bounding box and the flat pixel
+    indices it covers; all slots' indices are concatenated so one gather and
+    one segmented sum reduce a whole frame plane to per-slot statistics.
+    """
+
+    def __init__(self, polygons, frame_shape):
+        self.polygons = [np.asarray(p, dtype=np.float32).reshape(-1, 2) for p in polygons]
+        self.frame_shape = tuple(frame_shape[:2])
+        frame_h, frame_w = self.frame_shape
+
+        x0, y0, x1, y1 = polygon_bounds(self.polygons)
+        self.boxes = (np.clip(x0, 0, frame_w), np.clip(y0, 0, frame_h),
+                      np.clip(x1, 0, frame_w), np.clip(y1, 0, frame_h))
+
+        self.masks = []
+        pixel_index = []
+        for i, poly in enumerate(self.polygons):
+            bx0, by0, bx1, by1 = (int(b[i]) for b in self.boxes)
+            mask = np.zeros((max(by1 - by0, 0), max(bx1 - bx0, 0)), dtype=np.uint8)
+            if mask.size:
+                cv2.fillPoly(mask, [np.round(poly - (bx0, by0)).astype(np.int32)], 1)
+            self.masks.append(mask.view(bool))
+            ys, xs = np.nonzero(mask)
+            pixel_index.append((ys + by0) * frame_w + xs + bx0)
+
+        self.counts = np.array([len(p) for p in pixel_index], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)))
+        self.pixel_index = (np.concatenate(pixel_index) if pixel_index else np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def select(self, indices):
+        """Flat pixel indices (slot after slot) and pixel counts for a subset of slots"""
+        indices = np.asarray(indices, dtype=np.intp)
+        counts = self.counts[indices]
+        starts = self.offsets[indices]
+        # Segment gather: start of each slot's run plus the position inside it
+        run_start = np.concatenate(([0], np.cumsum(counts)[:-1])) if len(counts) else counts
+        positions = np.arange(counts.sum()) + np.repeat(starts - run_start, counts)
+        return self.pixel_index[positions], counts
+
+    def score(self, img_thresh, gray, indices=None):
+        """Occupancy ratio, gray variance and edge density over each slot's masked pixels.
+
+        Same meaning as slot_scoring.score_slots; slots covering no pixels
+        score NaN (occupied). With indices the arrays follow indices. Edges
+        come from a full-frame Canny pass, as in score_slots.
+        """
+        if indices is None:
+            pixels, counts = self.pixel_index, self.counts
+        else:
+            pixels, counts = self.select(indices)
+        edges = cv2.Canny(gray, CANNY_LOW, CANNY_HIGH)
+
+        occupied = img_thresh.reshape(-1)[pixels] > 0
+        edge = edges.reshape(-1)[pixels] > 0
+        values = gray.reshape(-1)[pixels].astype(np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            occupancy_ratio = segment_sums(occupied, counts) / counts
+            edge_density = segment_sums(edge, counts) / counts
+            mean = segment_sums(values, counts) / counts
+            gray_variance = segment_sums(values * values, counts) / counts - mean * mean
+
+        np.maximum(gray_variance, 0, out=gray_variance)
+        return occupancy_ratio, gray_variance, edge_density
@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+
+# Offset that keeps cell columns non-negative inside the packed cell key
+_COLUMN_OFFSET = 1 << 30
+
+
+class SlotGrid:
+    """Uniform-grid index over equally sized slot rectangles.
+
+    Each slot is filed under the cell holding its top-left corner. With a
+    cell at least as large as a slot, a point can only fall in slots filed
+    in its own cell or the cells above/left of it, so hit tests and area
+    queries look at a handful of cells instead of the whole layout. Cells
+    are stored as one sorted key array; every row of cells in a query is a
+    single searchsorted range.
+    """
+
+    def __init__(self, width, height, cell=None):
+        self.width, self.height = width, height
+        self.cell = cell or max(width, height)
+        self.rebuild([])
+
+    def _keys(self, cx, cy):
+        return cy * (2 * _COLUMN_OFFSET) + (cx + _COLUMN_OFFSET)
+
+    def rebuild(self, pos_list):
+        """Index pos_list; O(n log n) in NumPy, about a millisecond for 10k slots"""
+        self.pos = np.asarray(pos_list, dtype=np.int64).reshape(-1, 2)
+        keys = self._keys(self.pos[:, 0] // self.cell, self.pos[:, 1] // self.cell)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.pos)
+
+    def _candidates(self, x0, y0, x1, y1):
+        """Slots whose top-left corner lies in a cell that can reach the box"""
+        cx0, cx1 = (x0 - self.width) // self.cell, x1 // self.cell
+        cy0, cy1 = (y0 - self.height) // self.cell, y1 // self.cell
+        rows = np.arange(cy0, cy1 + 1)
+        lo = np.searchsorted(self.sorted_keys, self._keys(cx0, rows), side="left")
+        hi = np.searchsorted(self.sorted_keys, self._keys(cx1, rows), side="right")
+        if len(rows) == 1:
+            return self.order[lo[0]:hi[0]]
+        return np.concatenate([self.order[a:b] for a, b in zip(lo, hi)])
+
+    def hit(self, x, y):
+        """Index of the first slot (in list order) strictly containing (x, y), or None"""
+        idx = self._candidates(x, y, x, y)
+        px, py = self.pos[idx, 0], self.pos[idx, 1]
+        inside = idx[(px < x) & (x < px + self.width) & (py < y) & (y < py + self.height)]
+        return int(inside.min()) if len(inside) else None
+
+    def query_rect(self, x0, y0, x1, y1):
+        """Sorted indices of slots intersecting the box [x0, x1] x [y0, y1]"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        idx = self._candidates(x0, y0, x1, y1)
+        px, py = self.pos[idx, 0], self.pos[idx, 1]
+        keep = (px <= x1) & (px + self.width >= x0) & (py <= y1) & (py + self.height >= y0)
+        return np.sort(idx[keep])
+
+    def query_inside(self, x0, y0, x1, y1):
+        """Sorted indices of slots lying completely inside the box"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        idx = self.query_rect(x0, y0, x1, y1)
+        px, py = self.pos[idx, 0], self.pos[idx, 1]
+        return idx[(px >= x0) & (px + self.width <= x1) & (py >= y0) & (py + self.height <= y1)]
+
+    def overlapping(self, x, y):
+        """Sorted indices of slots whose area overlaps a slot placed at (x, y)"""
+        idx = self._candidates(x, y, x + self.width, y + self.height)
+        px, py = self.pos[idx, 0], self.pos[idx, 1]
+        keep = ((px < x + self.width) & (px + self.width > x) &
+                (py < y + self.height) & (py + self.height > y))
+        return np.sort(idx[keep])
+
+
+def _step(ux, uy, width, height, spacing):
+    """Distance along unit direction (ux, uy) between slots that just clear each other"""
+    limits = []
+    if abs(ux) > 1e-9:
+        limits.append(width / abs(ux))
+    if abs(uy) > 1e-9:
+        limits.append(height / abs(uy))
+    return min(limits) + spacing
+
+
+def layout_block(start, end, width, height, spacing=4, rows=1):
+    """Top-left positions for rows of slots along the drag from start to end.
+
+    Slots are placed along the drag direction (any angle) until the drag
+    length is used up; extra rows are stacked perpendicular to it, on the
+    side the drag turns towards (below a left-to-right drag).
+    """
+    (sx, sy), (ex, ey) = start, end
+    length = math.hypot(ex - sx, ey - sy)
+    if length < 1:
+        return [(int(sx), int(sy))]
+    ux, uy = (ex - sx) / length, (ey - sy) / length
+    vx, vy = -uy, ux
+
+    along = _step(ux, uy, width, height, spacing)
+    across = _step(vx, vy, width, height, spacing)
+    per_row = int(length // along) + 1
+
+    positions = []
+    for r in range(max(1, rows)):
+        ox, oy = sx + vx * across * r, sy + vy * across * r
+        for k in range(per_row):
+            positions.append((int(round(ox + ux * along * k)), int(round(oy + uy * along * k))))
+    return positions
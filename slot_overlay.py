@@ -0,0 +1,205 @@
+import time
+
+import cv2
+import numpy as np
+
+AVAILABLE_COLOR = (0, 255, 0)
+OCCUPIED_COLOR = (0, 0, 255)
+
+# Top-left area holding the counters (cleared and redrawn when a count changes)
+COUNTER_BAND = (0, 0, 420, 165)
+
+# Rectangle outlines are 2 px thick and spill one pixel outside the slot
+OUTLINE_SPILL = 2
+
+
+class SlotOverlay:
+    """Pre-rendered slot rectangles and counters, blended onto frames in one copy.
+
+    The layer is rebuilt only when the slot layout or frame size changes;
+    otherwise update() redraws just the slots whose state differs from what
+    is already on the layer, and the counters only when a count changed. The
+    result matches drawing every slot in index order, overlaps included.
+
+    blend() writes the layer onto a frame with one masked copy, plus an
+    alpha blend of the few anti-aliased text edge pixels.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.pos = []
+        self.size = (0, 0)
+        self.polygons = None  # Integer corner arrays when slots are polygons
+        self.layer = None  # BGR pixels of the overlay
+        self.mask = None  # uint8 coverage, 255 where the layer is opaque
+        self.opaque = None  # uint8, 1 where the layer fully covers the frame
+        self.edge_index = None  # Flat indices of anti-aliased (partial coverage) pixels
+        self.edge_alpha = None
+        self.edge_pixels = None
+        self.above = []  # Per slot, later slots whose outlines touch it
+        self.drawn = None  # Slot states currently on the layer
+        self.counts = None  # (available, total) currently on the layer
+        self.updated = 0.0  # perf_counter of the last update()
+
+    def update(self, frame_shape, pos_list, width, height, slot_state, available_count=None,
+               polygons=None):
+        """Bring the layer in line with slot_state; available_count=None hides the counters.
+
+        With polygons, slots are drawn as those outlines; pos_list, width and
+        height must then be boxes covering them.
+        """
+        key = (frame_shape[:2], width, height, np.asarray(pos_list, dtype=np.int64).tobytes(),
+               id(polygons))
+        state = np.asarray(slot_state, dtype=np.uint8)
+
+        rebuilt = counters_changed = False
+        if key != self.key:
+            frame_h, frame_w = frame_shape[:2]
+            self.key = key
+            self.pos, self.size = pos_list, (width, height)
+            self.polygons = (None if polygons is None else
+                             [np.round(p).astype(np.int32).reshape(-1, 1, 2) for p in polygons])
+            self.layer = np.zeros((frame_h, frame_w, 3), dtype=np.uint8)
+            self.mask = np.zeros((frame_h, frame_w), dtype=np.uint8)
+            self.above = self._later_neighbours()
+            self.drawn = state.copy()
+            self.counts = None
+            for i in range(len(pos_list)):
+                self._draw_slot(i)
+            rebuilt = True
+        else:
+            dirty = np.flatnonzero(state != self.drawn)
+            self.drawn[:] = state
+            self._repaint(dirty)
+            # Counters sit on top of slots; repaint them if a slot was drawn over them
+            if any(self._under_counters(i) for i in dirty):
+                self.counts = False
+
+        counts = None if available_count is None else (available_count, len(pos_list))
+        if counts != self.counts:
+            self._draw_counters(counts)
+            self.counts = counts
+            counters_changed = True
+
+        if rebuilt:
+            self.opaque = (self.mask == 255).view(np.uint8)
+            self.edge_index = self._edge_pixels(self.mask)
+        elif counters_changed:
+            # Only the band changed; leave the rest of the coverage as it was
+            bx0, by0, bx1, by1 = COUNTER_BAND
+            band = self.mask[by0:by1, bx0:bx1]
+            self.opaque[by0:by1, bx0:bx1] = band == 255
+            frame_w = self.mask.shape[1]
+            ys, xs = np.divmod(self.edge_index, frame_w)
+            outside = (xs < bx0) | (xs >= bx1) | (ys < by0) | (ys >= by1)
+            band_ys, band_xs = np.divmod(self._edge_pixels(band), band.shape[1])
+            self.edge_index = np.concatenate((self.edge_index[outside],
+                                              (band_ys + by0) * frame_w + band_xs + bx0))
+        if rebuilt or counters_changed:
+            self.edge_alpha = self.mask.reshape(-1)[self.edge_index, None].astype(np.uint16)
+        self.edge_pixels = self.layer.reshape(-1, 3)[self.edge_index].astype(np.uint16)
+        self.updated = time.perf_counter()
+
+    def blend(self, img):
+        """Write the overlay onto img in place (copy opaque pixels, blend anti-aliased edges)"""
+        if self.layer is None or self.layer.shape != img.shape:
+            return img
+        cv2.copyTo(self.layer, self.opaque, img)
+        if len(self.edge_index):
+            # Layer pixels are already premultiplied by their coverage (drawn on black)
+            flat = img.reshape(-1, 3)  # A view for decoded frames, which are contiguous
+            background = flat[self.edge_index].astype(np.uint16)
+            flat[self.edge_index] = np.minimum(
+                background * (255 - self.edge_alpha) // 255 + self.edge_pixels, 255)
+            if not img.flags.c_contiguous:
+                img[...] = flat.reshape(img.shape)
+        return img
+
+    @staticmethod
+    def _edge_pixels(mask):
+        """Flat indices of partially covered (anti-aliased) pixels in mask"""
+        return np.flatnonzero((mask > 0) & (mask < 255))
+
+    def _later_neighbours(self):
+        """For each slot, the higher-index slots whose outlines can overlap it"""
+        pos = np.asarray(self.pos, dtype=np.int64).reshape(-1, 2)
+        w, h = self.size
+        reach_x, reach_y = w + 2 * OUTLINE_SPILL, h + 2 * OUTLINE_SPILL
+        order = np.argsort(pos[:, 0], kind="stable")
+        xs = pos[order, 0]
+        lo = np.searchsorted(xs, pos[:, 0] - reach_x, side="left")
+        hi = np.searchsorted(xs, pos[:, 0] + reach_x, side="right")
+        above = []
+        for i in range(len(pos)):
+            near = order[lo[i]:hi[i]]
+            above.append(near[(near > i) & (np.abs(pos[near, 1] - pos[i, 1]) <= reach_y)])
+        return above
+
+    def _repaint(self, indices):
+        """Redraw slots, then restore later slots that were drawn over them.
+
+        Later neighbours are only redrawn inside the repainted slot's box, so
+        the layer matches drawing every slot in index order without the
+        repaint spreading along rows of touching slots.
+        """
+        frame_h, frame_w = self.mask.shape
+        w, h = self.size
+        for i in sorted(int(i) for i in indices):
+            self._draw_slot(i)
+            if len(self.above[i]) == 0:
+                continue
+            x, y = self.pos[i]
+            x0, y0 = max(x - OUTLINE_SPILL, 0), max(y - OUTLINE_SPILL, 0)
+            x1, y1 = min(x + w + OUTLINE_SPILL + 1, frame_w), min(y + h + OUTLINE_SPILL + 1, frame_h)
+            for j in self.above[i]:
+                self._draw_slot(j, (x0, y0, x1, y1))
+
+    def _under_counters(self, i):
+        x, y = self.pos[i]
+        w, h = self.size
+        bx0, by0, bx1, by1 = COUNTER_BAND
+        return (x - OUTLINE_SPILL < bx1 and y - OUTLINE_SPILL < by1 and
+                x + w + OUTLINE_SPILL > bx0 and y + h + OUTLINE_SPILL > by0)
+
+    def _draw_slot(self, i, clip=None):
+        """Draw slot i on the layer and mask, optionally only inside clip=(x0, y0, x1, y1)"""
+        x, y = self.pos[i]
+        w, h = self.size
+        color = AVAILABLE_COLOR if self.drawn[i] == 1 else OCCUPIED_COLOR
+        layer, mask = self.layer, self.mask
+        x0, y0 = 0, 0
+        if clip is not None:
+            x0, y0, x1, y1 = clip
+            layer, mask = layer[y0:y1, x0:x1], mask[y0:y1, x0:x1]
+        if self.polygons is not None:
+            outline = [(self.polygons[i] - (x0, y0)).astype(np.int32)]
+            cv2.polylines(layer, outline, True, color, 2)
+            cv2.polylines(mask, outline, True, 255, 2)
+            return
+        x, y = x - x0, y - y0
+        cv2.rectangle(layer, (x, y), (x + w, y + h), color, 2)
+        cv2.rectangle(mask, (x, y), (x + w, y + h), 255, 2)
+
+    def _draw_counters(self, counts):
+        bx0, by0, bx1, by1 = COUNTER_BAND
+        self.layer[by0:by1, bx0:bx1] = 0
+        self.mask[by0:by1, bx0:bx1] = 0
+
+        # Slots under the band lost their outline pixels there
+        self._repaint([i for i in range(len(self.pos)) if self._under_counters(i)])
+
+        if counts is None:
+            return
+        available_count, total_slots = counts
+        occupied_slots = total_slots - available_count
+        texts = [
+            (f"AVAILABLE: {available_count}", (10, 30), 1, (0, 255, 0), 3),
+            (f"OCCUPIED: {occupied_slots}", (10, 70), 1, (0, 0, 255), 3),
+            (f"TOTAL: {total_slots}", (10, 110), 1, (255, 255, 255), 3),
+        ]
+        if total_slots > 0:
+            utilization = (occupied_slots / total_slots) * 100
+            texts.append((f"UTILIZATION: {utilization:.1f}%", (10, 150), 0.8, (255, 255, 0), 2))
+        for text, org, scale, color, thickness in texts:
+            cv2.putText(self.layer, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+            cv2.putText(self.mask, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, 255, thickness)
@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+
+
+class SlotPublisher:
+    """Publishes a detector's slot states to the database as deltas.
+
+    observe() is called with the debounced slot states after every analysed
+    frame. The first change opens a window of window seconds; when it
+    closes, the slots that differ from the last-sent snapshot go out as one
+    multi-path update (slots/<i>, available, updated) through a
+    WriteBehindQueue. Slots that flip and flip back inside the window, and
+    frames where nothing changed, cost no write at all, so the write rate
+    follows parking events rather than frame rate or slot count.
+
+    The first publication (and the one after the queue dropped a batch, or
+    the layout changed size) sets the whole node under path instead.
+    """
+
+    def __init__(self, writes, path, window=2.0, clock=time.monotonic):
+        self.writes = writes
+        self.path = path.strip("/")
+        self.window = window
+        self.clock = clock
+
+        self.last_sent = None  # Slot states as last handed to the queue
+        self.latest = None
+        self.dirty_since = None  # Clock time of the first unsent change
+        self.dropped_seen = 0
+        self.updates = 0  # Writes handed to the queue
+        self.slots_sent = 0  # Slot values in those writes
+
+    def observe(self, slot_state):
+        """Record the current slot states; publishes once a change has waited window seconds"""
+        now = self.clock()
+        if self.dirty_since is None:
+            if self.last_sent is not None and np.array_equal(slot_state, self.last_sent):
+                return False
+            self.dirty_since = now
+        self.latest = slot_state.copy()
+        if now - self.dirty_since >= self.window:
+            return self.flush()
+        return False
+
+    def flush(self):
+        """Publish pending changes now; returns True when a write was queued"""
+        self.dirty_since = None
+        latest = self.latest
+        if latest is None:
+            return False
+        if self.writes.dropped != self.dropped_seen:
+            # A batch never arrived: the database may disagree with last_sent
+            self.dropped_seen = self.writes.dropped
+            self.last_sent = None
+
+        available = int(np.count_nonzero(latest))
+        if self.last_sent is None or self.last_sent.shape != latest.shape:
+            self.writes.set(self.path, {
+                # Keyed like the slots/<i> deltas, so a delta folded into this write keeps the rest
+                "slots": {str(i): state for i, state in enumerate(latest.tolist())},
+                "available": available,
+                "total": len(latest),
+                "updated": time.time(),
+            })
+            self.slots_sent += len(latest)
+        else:
+            changed = np.flatnonzero(latest != self.last_sent)
+            if len(changed) == 0:
+                return False
+            fields = {f"slots/{i}": int(latest[i]) for i in changed.tolist()}
+            fields.update({"available": available, "updated": time.time()})
+            self.writes.update(self.path, fields)
+            self.slots_sent += len(changed)
+        self.last_sent = latest
+        self.updates += 1
+        return True
@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+# Tile edge used to group slots into processing strips
+REGION_TILE = 64
+
+# Above this coverage a single full-frame pass is cheaper than many strips
+FULL_FRAME_COVERAGE = 0.7
+
+
+def kernel_padding(block_size, blur_size):
+    """Pixels of context needed so blur + adaptive threshold match full-frame output"""
+    pad = block_size // 2
+    if blur_size > 1:
+        pad += blur_size // 2
+    return pad
+
+
+def processing_regions(pos_list, width, height, frame_shape, tile=REGION_TILE):
+    """Cover every slot with a few (x0, y0, x1, y1) strips.
+
+    Slots are rasterised onto a coarse tile grid; each tile row becomes
+    horizontal runs, and runs with the same extent in consecutive rows are
+    merged into one strip. Returns None when the strips would cover most of
+    the frame anyway.
+    """
+    frame_h, frame_w = frame_shape[:2]
+    if len(pos_list) == 0:
+        return []
+
+    rows, cols = -(-frame_h // tile), -(-frame_w // tile)
+    grid = np.zeros((rows, cols), dtype=bool)
+    pos = np.asarray(pos_list, dtype=np.int64).reshape(-1, 2)
+    x0 = np.clip(pos[:, 0], 0, frame_w) // tile
+    y0 = np.clip(pos[:, 1], 0, frame_h) // tile
+    x1 = -(-np.clip(pos[:, 0] + width, 0, frame_w) // tile)
+    y1 = -(-np.clip(pos[:, 1] + height, 0, frame_h) // tile)
+    for i in range(len(pos)):
+        grid[y0[i]:y1[i], x0[i]:x1[i]] = True
+
+    if grid.mean() > FULL_FRAME_COVERAGE:
+        return None
+
+    regions = []
+    open_runs = {}  # (c0, c1) -> index into regions of the strip still growing
+    for r in range(rows):
+        padded = np.concatenate(([False], grid[r], [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        runs = list(zip(edges[::2], edges[1::2]))
+        next_runs = {}
+        for c0, c1 in runs:
+            ry0, ry1 = r * tile, min((r + 1) * tile, frame_h)
+            rx0, rx1 = c0 * tile, min(c1 * tile, frame_w)
+            if (c0, c1) in open_runs:
+                idx = open_runs[(c0, c1)]
+                regions[idx][3] = ry1
+            else:
+                idx = len(regions)
+                regions.append([rx0, ry0, rx1, ry1])
+            next_runs[(c0, c1)] = idx
+        open_runs = next_runs
+
+    return [tuple(int(v) for v in region) for region in regions]
+
+
+def threshold_regions(img, regions, block_size, c_value, blur_size):
+    """Gray -> blur -> adaptive threshold on the given regions only.
+
+    Each region is processed with kernel_padding pixels of context, so the
+    pixels inside it are identical to a full-frame pass; everything outside
+    the regions is zero.
+    """
+    frame_h, frame_w = img.shape[:2]
+    pad = kernel_padding(block_size, blur_size)
+    thresh = np.zeros((frame_h, frame_w), dtype=np.uint8)
+
+    for x0, y0, x1, y1 in regions:
+        px0, py0 = max(x0 - pad, 0), max(y0 - pad, 0)
+        px1, py1 = min(x1 + pad, frame_w), min(y1 + pad, frame_h)
+
+        gray = cv2.cvtColor(img[py0:py1, px0:px1], cv2.COLOR_BGR2GRAY)
+        if blur_size > 1:
+            gray = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
+        region_thresh = cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY_INV, block_size, c_value
+        )
+        thresh[y0:y1, x0:x1] = region_thresh[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+
+    return thresh
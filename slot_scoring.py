@@ -0,0 +1,146 @@
+import cv2
+import numpy as np
+
+# Decision thresholds shared by the live detector and the Streamlit sync
+OCCUPANCY_LIMIT = 0.5
+EDGE_DENSITY_LIMIT = 0.1
+VARIANCE_LIMIT = 800
+
+# Canny thresholds (lower sensitivity)
+CANNY_LOW, CANNY_HIGH = 30, 100
+
+# Crop-by-crop scoring costs about this many pixels' worth of work per slot on top of
+# the slot's own area; it is used while that estimate stays below CROP_COST_FRACTION
+# of the frame (the integrals it skips cost roughly the whole frame)
+CROP_SLOT_OVERHEAD = 3000
+CROP_COST_FRACTION = 0.8
+
+
+def slot_boxes(pos_list, width, height, frame_shape):
+    """Clip slot rectangles to the frame and return (x0, y0, x1, y1) index arrays"""
+    frame_h, frame_w = frame_shape[:2]
+    pos = np.asarray(pos_list, dtype=np.int64).reshape(-1, 2)
+
+    x0 = np.clip(pos[:, 0], 0, frame_w)
+    y0 = np.clip(pos[:, 1], 0, frame_h)
+    x1 = np.clip(pos[:, 0] + width, 0, frame_w)
+    y1 = np.clip(pos[:, 1] + height, 0, frame_h)
+    return x0, y0, x1, y1
+
+
+def box_sums(integral, x0, y0, x1, y1):
+    """Sum of every box from an integral image in four gathers"""
+    return integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+
+
+def scaled_slot_boxes(pos_list, width, height, scale, frame_shape):
+    """Slot boxes on a frame downsampled by an integer scale (covering every source pixel)"""
+    frame_h, frame_w = frame_shape[:2]
+    pos = np.asarray(pos_list, dtype=np.int64).reshape(-1, 2)
+
+    x0 = np.clip(pos[:, 0] // scale, 0, frame_w)
+    y0 = np.clip(pos[:, 1] // scale, 0, frame_h)
+    x1 = np.clip(-(-(pos[:, 0] + width) // scale), 0, frame_w)
+    y1 = np.clip(-(-(pos[:, 1] + height) // scale), 0, frame_h)
+    return x0, y0, x1, y1
+
+
+def downsample(gray, scale):
+    """Area-average a gray frame by an integer factor"""
+    h, w = gray.shape[:2]
+    return cv2.resize(gray, (max(1, w // scale), max(1, h // scale)), interpolation=cv2.INTER_AREA)
+
+
+def slot_motion(small, reference, boxes):
+    """Mean absolute difference per slot between two downsampled gray frames"""
+    diff_int = cv2.integral(cv2.absdiff(small, reference))
+    x0, y0, x1, y1 = boxes
+    area = ((x1 - x0) * (y1 - y0)).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return box_sums(diff_int, x0, y0, x1, y1) / area
+
+
+def prefer_crops(boxes, frame_shape):
+    """True when reducing these slot boxes crop by crop is cheaper than building integral images"""
+    x0, y0, x1, y1 = boxes
+    crop_cost = np.sum((x1 - x0) * (y1 - y0)) + len(x0) * CROP_SLOT_OVERHEAD
+    return crop_cost < CROP_COST_FRACTION * frame_shape[0] * frame_shape[1]
+
+
+def _score_crops(img_thresh, gray, edges, boxes):
+    """Per-crop scoring for a few slots (avoids the integral images)"""
+    x0, y0, x1, y1 = boxes
+    n = len(x0)
+    occupancy_ratio = np.full(n, np.nan)
+    gray_variance = np.full(n, np.nan)
+    edge_density = np.full(n, np.nan)
+
+    for k in range(n):
+        if x1[k] <= x0[k] or y1[k] <= y0[k]:
+            continue
+        space_crop = img_thresh[y0[k]:y1[k], x0[k]:x1[k]]
+        occupancy_ratio[k] = np.count_nonzero(space_crop) / space_crop.size
+        gray_space = gray[y0[k]:y1[k], x0[k]:x1[k]]
+        gray_variance[k] = np.var(gray_space)
+        edge_crop = edges[y0[k]:y1[k], x0[k]:x1[k]]
+        edge_density[k] = np.count_nonzero(edge_crop) / edge_crop.size
+
+    return occupancy_ratio, gray_variance, edge_density
+
+
+def score_slots(img, img_thresh, pos_list, width=103, height=43, gray=None, indices=None):
+    """Compute occupancy ratio, gray variance and edge density for all slots at once.
+
+    The threshold, gray and edge planes are built once per frame and every slot
+    is reduced with integral images, so the cost per slot is a handful of array
+    lookups. Returns three float arrays indexed like pos_list; slots that fall
+    completely outside the frame score NaN, which the decision treats as occupied.
+
+    With indices, only those slots are scored and the arrays follow indices.
+    Layouts or subsets covering little of the frame (prefer_crops) are reduced
+    crop by crop instead of through integral images. Edges always come from
+    one Canny pass over the whole frame, since Canny's hysteresis follows
+    edges across crop borders; both paths score a slot identically.
+    """
+    if indices is not None:
+        indices = np.asarray(indices, dtype=np.intp)
+        pos_list = np.asarray(pos_list, dtype=np.int64).reshape(-1, 2)[indices]
+        if np.ndim(width):
+            width, height = np.asarray(width)[indices], np.asarray(height)[indices]
+
+    if len(pos_list) == 0:
+        empty = np.zeros(0, dtype=np.float64)
+        return empty, empty.copy(), empty.copy()
+
+    if gray is None:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    edges = cv2.Canny(gray, CANNY_LOW, CANNY_HIGH)
+    boxes = slot_boxes(pos_list, width, height, img_thresh.shape)
+    if prefer_crops(boxes, img_thresh.shape):
+        return _score_crops(img_thresh, gray, edges, boxes)
+
+    # 0/1 planes keep the int32 integrals far from overflow on large frames
+    occ_int = cv2.integral((img_thresh > 0).view(np.uint8))
+    edge_int = cv2.integral((edges > 0).view(np.uint8))
+    gray_sum, gray_sqsum = cv2.integral2(gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+    x0, y0, x1, y1 = boxes
+    area = ((x1 - x0) * (y1 - y0)).astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        occupancy_ratio = box_sums(occ_int, x0, y0, x1, y1) / area
+        edge_density = box_sums(edge_int, x0, y0, x1, y1) / area
+        mean = box_sums(gray_sum, x0, y0, x1, y1) / area
+        gray_variance = box_sums(gray_sqsum, x0, y0, x1, y1) / area - mean * mean
+
+    # Guard against tiny negative values from floating point cancellation
+    np.maximum(gray_variance, 0, out=gray_variance)
+    return occupancy_ratio, gray_variance, edge_density
+
+
+def available_mask(occupancy_ratio, gray_variance, edge_density):
+    """Apply the three-threshold decision to every slot (True = available)"""
+    return ((occupancy_ratio < OCCUPANCY_LIMIT) &
+            (edge_density < EDGE_DENSITY_LIMIT) &
+            (gray_variance < VARIANCE_LIMIT))
@@ -1,67 +1,75 @@
 import streamlit as st
 
+from app_cache import fragment
+
 def status_page(zones):
     st.subheader("📊 Control Parking Status")
 
     cols = st.columns(len(zones))
     for i, col in enumerate(cols):
         with col:
-            zone = zones[i]
-            status = st.session_state.statuses[zone]
-            color = "#d4edda" if "✅" in status else "#f8d7da"
-            text_color = "#155724" if "✅" in status else "#721c24"
+            zone_control(zones[i])
+
+
+def _set_status(zone, status):
+    st.session_state.statuses[zone] = status
+
+
+@fragment
+def zone_control(zone):
+    """One zone's tile, buttons and contact editor; a click reruns only this tile"""
+    status = st.session_state.statuses[zone]
+    color = "#d4edda" if "✅" in status else "#f8d7da"
+    text_color = "#155724" if "✅" in status else "#721c24"
 
-            with st.container():
-                st.markdown(
-                    f"""
-                    <div style="
-                        border: 2px solid #4CAF50;
-                        border-radius: 16px;
-                        padding: 20px;
-                        text-align: center;
-                        font-size: 20px;
-                        font-weight: bold;
-                        background-color: {color};
-                        color: {text_color};
-                        box-shadow: 4px 4px 12px rgba(0,0,0,0.2);
-                        margin-bottom: 10px;
-                    ">
-                        {zone} <br> {status}
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+    with st.container():
+        st.markdown(
+            f"""
+            <div style="
+                border: 2px solid #4CAF50;
+                border-radius: 16px;
+                padding: 20px;
+                text-align: center;
+                font-size: 20px;
+                font-weight: bold;
+                background-color: {color};
+                color: {text_color};
+                box-shadow: 4px 4px 12px rgba(0,0,0,0.2);
+                margin-bottom: 10px;
+            ">
+                {zone} <br> {status}
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-                btn_col1, btn_col2, btn_col3 = st.columns([1, 1, 1])
+        btn_col1, btn_col2, btn_col3 = st.columns([1, 1, 1])
 
-                with btn_col1:
-                    if st.button("✅", key=f"avail_{zone}"):
-                        st.session_state.statuses[zone] = "✅ Available"
-                        st.rerun()
+        # Callbacks run before the fragment reruns, so the tile above shows the new status
+        with btn_col1:
+            st.button("✅", key=f"avail_{zone}", on_click=_set_status, args=(zone, "✅ Available"))
 
-                with btn_col2:
-                    if st.button("❌", key=f"occ_{zone}"):
-                        st.session_state.statuses[zone] = "❌ Occupied"
-                        st.rerun()
+        with btn_col2:
+            st.button("❌", key=f"occ_{zone}", on_click=_set_status, args=(zone, "❌ Occupied"))
 
-                with btn_col3:
-                    if st.button("📞", key=f"toggle_{zone}"):
-                        st.session_state.active_contact = (
-                            None if st.session_state.active_contact == zone else zone
-                        )
-                        st.rerun()
+        with btn_col3:
+            if st.button("📞", key=f"toggle_{zone}"):
+                previous = st.session_state.active_contact
+                st.session_state.active_contact = None if previous == zone else zone
+                if previous not in (None, zone):
+                    st.rerun()  # Another tile's contact editor has to close too
 
-            if st.session_state.active_contact == zone:
-                new_number = st.text_input(
-                    f"Edit contact for {zone}",
-                    value=st.session_state.contacts[zone],
-                    key=f"contact_input_{zone}",
-                    label_visibility="collapsed"
-                )
-                st.session_state.contacts[zone] = new_number
+    if st.session_state.active_contact == zone:
+        new_number = st.text_input(
+            f"Edit contact for {zone}",
+            value=st.session_state.contacts[zone],
+            key=f"contact_input_{zone}",
+            label_visibility="collapsed"
+        )
+        st.session_state.contacts[zone] = new_number
 
-                if st.button("📞 Call", key=f"call_{zone}"):
-                    st.markdown(
-                        f'<meta http-equiv="refresh" content="0; url=tel:{new_number}">',
-                        unsafe_allow_html=True
-                    )
+        if st.button("📞 Call", key=f"call_{zone}"):
+            st.markdown(
+                f'<meta http-equiv="refresh" content="0; url=tel:{new_number}">',
+                unsafe_allow_html=True
+            )
@@ -0,0 +1,49 @@
+"""Realtime Database backend selection.
+
+Pages call storage.reference(path) instead of firebase_admin.db.reference.
+PARKING_DB=firebase (the default) connects with firebase_key.json;
+PARKING_DB=local serves an in-process local_db.LocalDatabase seeded from
+database.json, for offline runs and load tests:
+
+    PARKING_DB=local PARKING_DB_LATENCY=0.08 PARKING_DB_FAILURE_RATE=0.01 streamlit run app.py
+"""
+import os
+import threading
+
+FIREBASE_URL = "https://smartparkingaihackathon-default-rtdb.firebaseio.com/"
+FIREBASE_KEY = "firebase_key.json"
+
+_local_database = None
+_lock = threading.Lock()
+
+
+def backend():
+    return os.environ.get("PARKING_DB", "firebase").lower()
+
+
+def local_database():
+    """The process-wide LocalDatabase, configured from PARKING_DB_* environment variables"""
+    global _local_database
+    with _lock:
+        if _local_database is None:
+            from local_db import LocalDatabase
+            _local_database = LocalDatabase.from_file(
+                os.environ.get("PARKING_DB_SEED", "database.json"),
+                latency=float(os.environ.get("PARKING_DB_LATENCY", 0)),
+                jitter=float(os.environ.get("PARKING_DB_JITTER", 0)),
+                failure_rate=float(os.environ.get("PARKING_DB_FAILURE_RATE", 0)),
+            )
+        return _local_database
+
+
+def reference(path="/"):
+    """A database reference on the configured backend (initialising Firebase on first use)"""
+    if backend() == "local":
+        return local_database().reference(path)
+
+    import firebase_admin
+    from firebase_admin import credentials, db
+    with _lock:
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate(FIREBASE_KEY), {"databaseURL": FIREBASE_URL})
+    return db.reference(path)
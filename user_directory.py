@@ -0,0 +1,74 @@
+import threading
+import time
+
+DEFAULT_ROLE = "student"
+
+
+class UserDirectory:
+    """Email -> user record lookups against /users with a process-wide TTL cache.
+
+    Every miss is one indexed query (order_by_child("email") needs
+    ".indexOn": "email" on /users) limited to a single record, so the cost
+    does not grow with the number of users. The record carries the role, so
+    login and role lookup share that one round trip. Unknown emails are
+    cached too, for negative_ttl seconds, and invalidate() drops entries
+    after an account changes.
+    """
+
+    def __init__(self, ref, ttl=300.0, negative_ttl=10.0):
+        self.ref = ref
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = {}  # email -> (expires, record or None)
+        self.lock = threading.Lock()
+
+    def lookup(self, email):
+        """The user record for email (with "role" filled in), or None when there is no such user"""
+        email = email.strip()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(email)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        found = self.ref.order_by_child("email").equal_to(email).limit_to_first(1).get()
+        record = None
+        if found:
+            key, user = next(iter(found.items()))
+            record = {**user, "key": key, "role": user.get("role", DEFAULT_ROLE)}
+        self._store(email, record)
+        return record
+
+    def _store(self, email, record):
+        ttl = self.ttl if record is not None else self.negative_ttl
+        with self.lock:
+            self.entries[email] = (time.monotonic() + ttl, record)
+
+    def authenticate(self, email, password):
+        """(record, error) for a login attempt; record is None when it failed"""
+        record = self.lookup(email)
+        if record is None:
+            return None, "❌ No account found with this email"
+        if record.get("password") != password:
+            return None, "❌ Wrong password"
+        return record, None
+
+    def create(self, email, password):
+        """Register a user; returns False when the email is already taken"""
+        email = email.strip()
+        # A cached miss may be stale by now; ask the database before creating
+        self.invalidate(email)
+        if self.lookup(email) is not None:
+            return False
+        user = {"email": email, "password": password}  # ⚠️ Plain text, production me hashing karo!
+        key = self.ref.push(user).key
+        self._store(email, {**user, "key": key, "role": DEFAULT_ROLE})
+        return True
+
+    def invalidate(self, email=None):
+        """Forget one email, or everything when email is None"""
+        with self.lock:
+            if email is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(email.strip(), None)
@@ -1,12 +1,31 @@
 import streamlit as st
 
+from app_cache import ZONE_REFRESH_SECONDS, fragment, live_zone_counts
+
 def view_page(zones):
     st.subheader("Parking Zones")
+    # The grid refreshes on its own timer; the rest of the page does not rerun
+    fragment(run_every=ZONE_REFRESH_SECONDS)(zone_grid)(zones)
+
+
+def zone_status(zone, live):
+    """Live "available/total" from the zone's camera feeds, else the status set on the Status page"""
+    counts = live.get(zone)
+    if not counts or not counts["total"]:
+        return st.session_state.statuses[zone]
+    icon = "✅" if counts["available"] else "❌"
+    status = f"{icon} {counts['available']}/{counts['total']} available"
+    if counts["live_feeds"] < counts["feeds"]:
+        status += f" ({counts['live_feeds']}/{counts['feeds']} feeds)"
+    return status
+
 
+def zone_grid(zones):
+    live = live_zone_counts()
     cols = st.columns(len(zones))
     for i, col in enumerate(cols):
         with col:
-            status = st.session_state.statuses[zones[i]]
+            status = zone_status(zones[i], live)
             color = "#d4edda" if "✅" in status else "#f8d7da"
             text_color = "#155724" if "✅" in status else "#721c24"
 
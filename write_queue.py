@@ -0,0 +1,195 @@
+import threading
+import time
+
+
+class WriteQueueFull(RuntimeError):
+    """Pending writes stayed at max_pending for longer than the enqueue timeout"""
+
+
+def _normalize(path):
+    return "/".join(k for k in path.split("/") if k)
+
+
+def _ancestors(path):
+    """Proper ancestor paths of a normalised path, nearest last"""
+    parts = path.split("/")
+    return ["/".join(parts[:i]) for i in range(1, len(parts))]
+
+
+def with_value(node, keys, value):
+    """Copy of a nested dict with value stored at keys (removed when None or empty, as in the database).
+
+    A list is treated like the database stores it, as a dict keyed "0", "1", ...,
+    so writing one index keeps its siblings.
+    """
+    if isinstance(node, list):
+        node = {str(i): v for i, v in enumerate(node) if v is not None}
+    node = dict(node) if isinstance(node, dict) else {}
+    if len(keys) == 1:
+        child = value
+    else:
+        child = with_value(node.get(keys[0]), keys[1:], value)
+    if child is None or child == {}:
+        node.pop(keys[0], None)
+    else:
+        node[keys[0]] = child
+    return node
+
+
+class WriteBehindQueue:
+    """Buffers Realtime Database writes and flushes them as multi-path update() calls.
+
+    set()/update()/delete() return immediately; a daemon thread waits
+    flush_interval seconds to let a burst collect, then sends up to
+    max_batch paths in one root update(). Writes to the same path coalesce
+    (last value wins), and a write below a pending path is folded into it,
+    because one update() may not contain both a path and its ancestor.
+    Failed batches are retried with backoff up to max_retries times and then
+    dropped (counted in dropped, reason in error). Once max_pending paths
+    are waiting, writers block for up to enqueue_timeout, then get
+    WriteQueueFull.
+    """
+
+    def __init__(self, root_ref, flush_interval=0.5, max_batch=500, max_pending=10000,
+                 max_retries=5, retry_delay=0.5, enqueue_timeout=5.0):
+        self.root_ref = root_ref
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.enqueue_timeout = enqueue_timeout
+
+        self.pending = {}  # Normalised path -> value, in first-enqueued order
+        self.branches = {}  # Ancestor path -> number of pending paths below it
+        self.in_flight = 0
+        self.last_write = {}  # Path -> monotonic time of the last throttled set
+        self.sent = 0
+        self.dropped = 0
+        self.error = None
+        self.cond = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+
+    def start(self):
+        if not self.thread.is_alive():
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Flush what is pending (for up to timeout seconds) and stop the thread"""
+        self.flush(timeout)
+        self.stop_event.set()
+        with self.cond:
+            self.cond.notify_all()
+        self.thread.join(timeout=timeout)
+
+    def set(self, path, value):
+        self._enqueue({_normalize(path): value})
+
+    def update(self, path, fields):
+        """Like Reference.update(): only the given children of path change"""
+        base = _normalize(path)
+        self._enqueue({f"{base}/{_normalize(k)}" if base else _normalize(k): v for k, v in fields.items()})
+
+    def delete(self, path):
+        self._enqueue({_normalize(path): None})
+
+    def set_throttled(self, path, value, min_interval):
+        """set() at most once per min_interval seconds per path; returns True when enqueued"""
+        now = time.monotonic()
+        with self.cond:
+            if now - self.last_write.get(path, float("-inf")) < min_interval:
+                return False
+            self.last_write[path] = now
+        self.set(path, value)
+        return True
+
+    def _enqueue(self, writes):
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self.cond:
+            while len(self.pending) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WriteQueueFull(f"{len(self.pending)} writes pending")
+                self.cond.wait(remaining)
+            for path, value in writes.items():
+                self._merge(path, value)
+            self.cond.notify_all()
+
+    def _merge(self, path, value):
+        """Add one write to pending, keeping no path and its ancestor side by side"""
+        for ancestor in _ancestors(path):
+            if ancestor in self.pending:
+                # Fold into the pending ancestor's value
+                keys = path[len(ancestor) + 1:].split("/")
+                self.pending[ancestor] = with_value(self.pending[ancestor], keys, value)
+                return
+        if path in self.branches:
+            prefix = path + "/"
+            for pending_path in [p for p in self.pending if p.startswith(prefix)]:
+                self._pop(pending_path)  # Overwritten by this write
+        if path in self.pending:
+            self._pop(path)  # Re-inserted at the end: it is the newest write
+        self.pending[path] = value
+        for ancestor in _ancestors(path):
+            self.branches[ancestor] = self.branches.get(ancestor, 0) + 1
+
+    def _pop(self, path):
+        for ancestor in _ancestors(path):
+            if self.branches[ancestor] == 1:
+                del self.branches[ancestor]
+            else:
+                self.branches[ancestor] -= 1
+        return self.pending.pop(path)
+
+    def flush(self, timeout=None):
+        """Wait until every pending write was sent (or dropped); returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.pending or self.in_flight:
+                if not self.thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def _take_batch(self):
+        with self.cond:
+            paths = list(self.pending)[:self.max_batch]
+            batch = {p: self._pop(p) for p in paths}
+            self.in_flight = len(batch)
+            self.cond.notify_all()  # Room for blocked writers
+        return batch
+
+    def _send(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.root_ref.update(batch)
+                self.sent += len(batch)
+                self.error = None
+                return True
+            except Exception as e:
+                self.error = f"Write failed ({attempt + 1}/{self.max_retries + 1}): {e}"
+                if self.stop_event.wait(self.retry_delay * 2 ** attempt):
+                    break
+        return False
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.stop_event.is_set():
+                    self.cond.wait()
+                if not self.pending and self.stop_event.is_set():
+                    return
+            # Give the burst a moment to collect (and coalesce) before sending
+            self.stop_event.wait(self.flush_interval)
+
+            batch = self._take_batch()
+            if batch and not self._send(batch):
+                self.dropped += len(batch)
+            with self.cond:
+                self.in_flight = 0
+                self.cond.notify_all()